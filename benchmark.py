@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the autonomous monitoring agent.
+
+Runs create_autonomous_agent() against a local fake Hacker News API (which
+also serves the linked article pages) and a fake OpenAI chat-completions
+server, then measures cycle latency
+percentiles, stories/sec, requests per cycle and peak RSS, plus seen-store
+and storage scaling at large history sizes and `main.py --once` cold starts. A fake feed server also
+checks the RSS, Atom and JSON Feed sources, their 304 path, and that a slow or failing source only
+loses its own stories. Nothing touches the network, so it can gate performance regressions in CI:
+
+    python benchmark.py --cycles 20 --items 500 --latency-ms 20 --error-rate 0.02
+    python benchmark.py --scale 10000,100000,1000000 --json bench.json --max-p95-ms 3000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HEADLINES = [
+    "New AI model beats benchmarks", "Show HN: A tiny database in Rust", "Why startups fail",
+    "The history of the bicycle", "LLM inference on a laptop", "Gardening in small spaces",
+    "Programming languages ranked", "A new algorithm for sorting", "Thailand travel notes",
+    "Software supply chain attacks", "Data engineering at scale", "He said, she said",
+]
+
+class FakeHackerNews:
+    """Local stand-in for the HN Firebase API with a feed that moves every cycle"""
+
+    def __init__(self, items=500, latency=0.0, error_rate=0.0, new_per_cycle=10, seed=7):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.new_per_cycle = new_per_cycle
+        self.random = random.Random(seed)
+        self.max_item = items
+        self.top = list(range(items, 0, -1))
+        self.updated = []
+        self.requests = 0
+        self.article_base = "https://example.com"  # pointed at this server once it is listening
+        self.article_requests = 0
+        self._lock = threading.Lock()
+
+    def advance(self):
+        """Simulate feed churn: new stories enter the top list, some scores change"""
+        with self._lock:
+            fresh = list(range(self.max_item + 1, self.max_item + 1 + self.new_per_cycle))
+            self.max_item += self.new_per_cycle
+            self.top = (fresh + self.top)[:500]
+            self.updated = self.random.sample(self.top, min(len(self.top), self.new_per_cycle))
+
+    def item(self, item_id):
+        return {
+            'id': item_id,
+            'type': 'story',
+            'title': f"{HEADLINES[item_id % len(HEADLINES)]} ({item_id})",
+            'url': f"{self.article_base}/article/{item_id}",
+            'score': item_id % 300,
+            'time': 1700000000 + item_id,
+        }
+
+    def route(self, path):
+        if path.endswith('/topstories.json'):
+            return self.top
+        if path.endswith('/maxitem.json'):
+            return self.max_item
+        if path.endswith('/updates.json'):
+            return {'items': self.updated, 'profiles': []}
+        if '/item/' in path:
+            return self.item(int(path.rsplit('/', 1)[1].split('.')[0]))
+        return None
+
+    def article(self, item_id):
+        """A page with chrome, scripts and a long body, like a typical news article"""
+        self.article_requests += 1
+        paragraph = f"<p>{HEADLINES[item_id % len(HEADLINES)]} and what it means for the industry, explained. " * 40
+        return (f"<html><head><title>{item_id}</title><script>var x = 1;</script></head><body>"
+                f"<nav><a href='/'>Home</a> <a href='/about'>About</a></nav><article>{paragraph}</article>"
+                f"<footer>Copyright</footer></body></html>").encode('utf-8')
+
+class FakeOpenAI:
+    """Local stand-in for /v1/chat/completions answering in the agent's expected formats"""
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=11, throttle_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def reply(self, prompt):
+        marker = 'Headlines:' if 'Headlines:' in prompt else 'Topics:' if 'Topics:' in prompt else None
+        if marker:
+            lines = []
+            for line in prompt.split(marker, 1)[1].strip().splitlines():
+                try:
+                    story = json.loads(line)
+                except ValueError:
+                    continue
+                lines.append(json.dumps({'id': story['id'], 'theme': 'AI Tools', 'sentiment': 'positive',
+                                         'insight': 'Benchmark insight'}))
+            return "\n".join(lines)
+        return "Key trend: benchmarks. Overall positive. Prediction: more benchmarks."
+
+    def complete(self, body):
+        prompt = body['messages'][0]['content']
+        content = self.reply(prompt)
+        usage = {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        self.prompt_tokens += usage['prompt_tokens']
+        self.completion_tokens += usage['completion_tokens']
+        return {
+            'id': 'chatcmpl-bench', 'object': 'chat.completion', 'created': int(time.time()),
+            'model': body.get('model', 'fake'), 'usage': usage,
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+        }
+
+class FakeFeeds:
+    """Local RSS, Atom and JSON Feed endpoints with ETags, plus a slow and a failing feed"""
+
+    def __init__(self, slow_seconds=2.0):
+        self.slow_seconds = slow_seconds
+        self.requests = 0
+        self.not_modified = 0
+        self.base = "https://example.com"  # pointed at this server once it is listening
+
+    def rss(self):
+        items = "".join(f"<item><title>{HEADLINES[i]}</title><link>{self.base}/rss/{i}</link><guid>rss-{i}</guid>"
+                        f"<pubDate>Tue, 14 Nov 2023 22:13:{20 + i:02d} GMT</pubDate></item>" for i in range(3))
+        return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Fake</title>{items}</channel></rss>'
+
+    def atom(self):
+        entries = "".join(f"<entry><title>{HEADLINES[i]}</title><link href='{self.base}/atom/{i}'/><id>atom-{i}</id>"
+                          f"<updated>2023-11-14T22:13:{20 + i:02d}Z</updated></entry>" for i in range(3, 5))
+        return f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>Fake</title>{entries}</feed>'
+
+    def json_feed(self):
+        return json.dumps({'version': 'https://jsonfeed.org/version/1.1', 'title': 'Fake', 'items': [
+            {'id': f"json-{i}", 'title': HEADLINES[i], 'url': f"{self.base}/json/{i}",
+             'date_published': f"2023-11-14T22:13:{20 + i:02d}Z"} for i in range(5, 7)]})
+
+    def respond(self, path, headers):
+        """(status, body, content type, extra headers) for a GET"""
+        self.requests += 1
+        name = path.strip('/').split('?')[0]
+        if name == 'fail.xml':
+            return 500, b'injected failure', 'text/plain', {}
+        if name == 'slow.xml':
+            time.sleep(self.slow_seconds)
+        feeds = {'rss.xml': (self.rss, 'application/rss+xml'), 'slow.xml': (self.rss, 'application/rss+xml'),
+                 'atom.xml': (self.atom, 'application/atom+xml'), 'feed.json': (self.json_feed, 'application/feed+json')}
+        if name not in feeds:
+            return 404, b'', 'text/plain', {}
+        render, content_type = feeds[name]
+        etag = f'"{name}-v1"'
+        if headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return 304, b'', content_type, {'ETag': etag}
+        return 200, render().encode('utf-8'), content_type, {'ETag': etag}
+
+def serve(fake):
+    """Start a keep-alive HTTP server for a fake API on a free local port"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, payload, content_type='application/json', headers=None):
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self, payload_fn):
+            fake.requests += 1
+            if fake.latency:
+                time.sleep(fake.latency)
+            if fake.error_rate and fake.random.random() < fake.error_rate:
+                return self._send(500, {'error': {'message': 'injected failure', 'type': 'server_error'}})
+            if getattr(fake, 'throttle_rate', 0) and fake.random.random() < fake.throttle_rate:
+                return self._send(429, {'error': {'message': 'injected rate limit', 'type': 'rate_limit_exceeded'}})
+            payload = payload_fn()
+            self._send(404 if payload is None else 200, payload)
+
+        def do_GET(self):
+            if hasattr(fake, 'respond'):
+                return self._send(*fake.respond(self.path, self.headers))
+            if '/article/' in self.path:
+                # Article pages are not part of the API; they are counted separately
+                return self._send(200, fake.article(int(self.path.rsplit('/', 1)[1])), 'text/html; charset=utf-8')
+            self._handle(lambda: fake.route(self.path))
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            self._handle(lambda: fake.complete(body))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def bench_cycles(args, hn, llm):
+    """Run the real agent flow for N cycles against the fakes (all profiles per cycle)"""
+    import main
+
+    profiles = [main.Profile()] if args.profiles <= 1 else \
+        [main.Profile(f"profile{i}", directory=f"profile{i}") for i in range(args.profiles)]
+    runs = [(main.create_autonomous_agent(),
+             {'agent_start_time': time.time(), 'cycles_completed': 0, 'profile': profile,
+              'scheduler': main.CycleScheduler(min_interval=args.wait, max_interval=args.wait, base_interval=args.wait)})
+            for profile in profiles]
+    latencies, hn_requests, llm_requests, article_requests, new_stories = [], [], [], [], 0
+
+    async def cycle(agent, shared):
+        await agent.run_async(shared)
+        await main.drain_analysis_queue(shared['profile'])
+
+    async def run():
+        nonlocal new_stories
+        for _ in range(args.cycles):
+            hn_before, llm_before, articles_before = hn.requests, llm.requests, hn.article_requests
+            started = time.perf_counter()
+            await asyncio.gather(*(cycle(agent, shared) for agent, shared in runs))
+            latencies.append(time.perf_counter() - started - args.wait)
+            hn_requests.append(hn.requests - hn_before)
+            llm_requests.append(llm.requests - llm_before)
+            article_requests.append(hn.article_requests - articles_before)
+            for _, shared in runs:
+                new_stories += shared.get('new_story_count', 0)
+                shared['profile'].storage.flush()
+            hn.advance()
+
+    total_started = time.perf_counter()
+    asyncio.run(run())
+    busy = sum(latencies)
+    return {
+        'cycles': args.cycles,
+        'profiles': len(profiles),
+        'cycle_p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'cycle_p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'cycle_p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'cycle_max_ms': round(max(latencies) * 1000, 1),
+        'stories_per_sec': round(new_stories / busy, 1) if busy else 0.0,
+        'new_stories': new_stories,
+        'hn_requests_per_cycle': round(statistics.mean(hn_requests), 1),
+        'hn_requests_first_cycle': hn_requests[0],
+        'llm_requests_per_cycle': round(statistics.mean(llm_requests), 2),
+        'article_fetches_per_cycle': round(statistics.mean(article_requests), 1),
+        'llm_prompt_tokens': llm.prompt_tokens,
+        'llm_completion_tokens': llm.completion_tokens,
+        'llm_spend_usd': round(main.get_llm_gateway().spent_today(), 6),
+        'wall_seconds': round(time.perf_counter() - total_started, 2),
+    }
+
+def bench_cold_start(hn, repeats):
+    """Wall time of `main.py --once` processes: first run, warm run with no new work, not-due run"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    workdir = os.path.abspath('coldstart')
+    os.makedirs(workdir, exist_ok=True)
+
+    def run(*args):
+        before = hn.requests
+        started = time.perf_counter()
+        code = subprocess.run([sys.executable, *args], cwd=workdir,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+        return (time.perf_counter() - started) * 1000, hn.requests - before, code
+
+    first_ms, first_requests, first_code = run(script, '--once')
+    warm = [run(script, '--once', '--force') for _ in range(repeats)]
+    not_due = [run(script, '--once') for _ in range(repeats)]
+    imports = [run('-c', f"import sys; sys.path.insert(0, {os.path.dirname(script)!r}); import main")[0]
+               for _ in range(repeats)]
+    return {
+        'first_run_ms': round(first_ms, 1),
+        'first_run_hn_requests': first_requests,
+        'warm_run_ms': round(statistics.median(ms for ms, _, _ in warm), 1),
+        'warm_run_hn_requests': max(requests for _, requests, _ in warm),
+        'not_due_ms': round(statistics.median(ms for ms, _, _ in not_due), 1),
+        'import_ms': round(statistics.median(imports), 1),
+        'exit_codes': sorted({first_code, *(code for _, _, code in warm + not_due)}),
+    }
+
+def bench_scaling(sizes):
+    """Seen-store and storage costs at growing history sizes"""
+    import main
+
+    results = []
+    for size in sizes:
+        db_path = f"scale_{size}.db"
+        store = main.SeenStoryStore(db_path, legacy_csv=None)
+        started = time.perf_counter()
+        chunk = 50000
+        for offset in range(0, size, chunk):
+            store.add_many([{'title': f"Historic story {i}", 'url': f"https://example.com/h/{i}"}
+                            for i in range(offset, min(size, offset + chunk))])
+        fill_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        reopened = main.SeenStoryStore(db_path, legacy_csv=None)
+        open_s = time.perf_counter() - started
+
+        probes = [f"Historic story {i}" for i in range(0, size, max(1, size // 1000))] + \
+                 [f"Brand new story {i}" for i in range(1000)]
+        started = time.perf_counter()
+        for title in probes:
+            reopened.contains(title)
+        contains_us = (time.perf_counter() - started) / len(probes) * 1e6
+
+        started = time.perf_counter()
+        reopened.add_many([{'title': f"Cycle story {i}"} for i in range(30)])
+        add_ms = (time.perf_counter() - started) * 1000
+
+        # Append cost with a history of `size` rows already on disk
+        record = {'timestamp': '2025-07-18T10:16:28', 'story_id': 1, 'title': 'Benchmark story',
+                  'theme': 'AI Tools', 'sentiment': 'positive', 'insight': 'Benchmark insight', 'story_count': 1}
+        backends = {
+            'csv': main.CSVBackend('.', files={**main.STORAGE_FILES, 'insights': f"scale_{size}.csv"}, flush_records=chunk),
+            'sqlite': main.SQLiteBackend(f"scale_{size}_storage.db", flush_records=chunk),
+        }
+        append_ms = {}
+        for name, backend in backends.items():
+            for offset in range(0, size, chunk):
+                backend.append('insights', [record] * min(chunk, size - offset))
+            backend.flush()
+            started = time.perf_counter()
+            backend.append('insights', [record] * 30)
+            backend.flush()
+            append_ms[name] = round((time.perf_counter() - started) * 1000, 2)
+            backend.close()
+
+        results.append({
+            'history_rows': size,
+            'seen_fill_s': round(fill_s, 2),
+            'seen_open_s': round(open_s, 3),
+            'seen_contains_us': round(contains_us, 2),
+            'seen_add_30_ms': round(add_ms, 2),
+            'insight_append_30_ms': append_ms,
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        })
+    return results
+
+def check_sources(feeds):
+    """Collect from the fake feeds twice: parsing, the 304 path, and slow/failing source isolation"""
+    import main
+
+    base = feeds.base
+    sources = main.build_sources([
+        {'type': 'rss', 'name': 'rss', 'url': f"{base}/rss.xml", 'filter_relevant': False},
+        {'type': 'rss', 'name': 'atom', 'url': f"{base}/atom.xml", 'filter_relevant': False},
+        {'type': 'json', 'name': 'json', 'url': f"{base}/feed.json", 'filter_relevant': False},
+        {'type': 'rss', 'name': 'slow', 'url': f"{base}/slow.xml", 'timeout': 0.5, 'filter_relevant': False},
+        {'type': 'rss', 'name': 'fail', 'url': f"{base}/fail.xml", 'filter_relevant': False},
+    ])
+    reuse_seconds, main.FETCH_REUSE_SECONDS = main.FETCH_REUSE_SECONDS, 0  # make the second pass ask again
+    try:
+        started = time.perf_counter()
+        first, first_failed = asyncio.run(main.collect_from_sources(sources))
+        first_ms = (time.perf_counter() - started) * 1000
+        second, second_failed = asyncio.run(main.collect_from_sources(sources))
+    finally:
+        main.FETCH_REUSE_SECONDS = reuse_seconds
+
+    by_source = {}
+    for story in first:
+        by_source.setdefault(story['source'], []).append(story)
+    checks = {
+        'rss_parsed': [s['title'] for s in by_source.get('rss', [])] == HEADLINES[0:3]
+                      and all(s['url'] and s['time'] for s in by_source['rss']),
+        'atom_parsed': [s['title'] for s in by_source.get('atom', [])] == HEADLINES[3:5]
+                       and all(s['url'] and s['time'] for s in by_source['atom']),
+        'json_feed_parsed': [s['title'] for s in by_source.get('json', [])] == HEADLINES[5:7]
+                            and all(s['url'] and s['time'] for s in by_source['json']),
+        'not_modified_reused': feeds.not_modified == 3 and
+                               sorted(s['id'] for s in second) == sorted(s['id'] for s in first),
+        'slow_and_failing_isolated': sorted(first_failed) == ['fail', 'slow'] == sorted(second_failed),
+        'slow_source_cut_off': first_ms < feeds.slow_seconds * 1000,
+    }
+    return {
+        'stories': len(first),
+        'failed_sources': sorted(first_failed),
+        'not_modified': feeds.not_modified,
+        'first_pass_ms': round(first_ms, 1),
+        'checks': checks,
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline agent benchmarks against local fake HN/OpenAI servers")
+    parser.add_argument('--cycles', type=int, default=10)
+    parser.add_argument('--items', type=int, default=500, help="stories in the fake top list")
+    parser.add_argument('--new-per-cycle', type=int, default=10, help="stories entering the top list each cycle")
+    parser.add_argument('--latency-ms', type=float, default=10.0, help="fake HN per-request latency")
+    parser.add_argument('--llm-latency-ms', type=float, default=200.0, help="fake OpenAI per-request latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of HN requests answering 500")
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help="fraction of LLM requests answering 500")
+    parser.add_argument('--profiles', type=int, default=1, help="monitoring profiles sharing one process")
+    parser.add_argument('--llm-throttle-rate', type=float, default=0.0, help="fraction of LLM requests answering 429")
+    parser.add_argument('--wait', type=float, default=0.01, help="seconds WaitNode sleeps per cycle")
+    parser.add_argument('--scale', default="10000,100000", help="comma-separated history sizes ('' to skip)")
+    parser.add_argument('--json', help="also write results to this file")
+    parser.add_argument('--max-p95-ms', type=float, help="exit 1 if cycle p95 exceeds this")
+    parser.add_argument('--cold-start', type=int, default=5, help="--once runs per cold-start measurement (0 skips)")
+    parser.add_argument('--max-cold-start-ms', type=float, help="exit 1 if a warm --once run takes longer than this")
+    parser.add_argument('--max-requests-per-cycle', type=float, help="exit 1 if mean HN requests per cycle exceed this")
+    parser.add_argument('--no-sources', action='store_true', help="skip the RSS/Atom/JSON Feed source checks")
+    args = parser.parse_args()
+
+    hn = FakeHackerNews(args.items, args.latency_ms / 1000, args.error_rate, args.new_per_cycle)
+    llm = FakeOpenAI(args.llm_latency_ms / 1000, args.llm_error_rate, throttle_rate=args.llm_throttle_rate)
+    hn_server, llm_server = serve(hn), serve(llm)
+    hn.article_base = f"http://127.0.0.1:{hn_server.server_port}"
+    feeds = FakeFeeds()
+    feeds.base = f"http://127.0.0.1:{serve(feeds).server_port}"
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix="agent-bench-")
+    os.chdir(workdir)
+    os.environ.update({
+        'HN_API_BASE': f"http://127.0.0.1:{hn_server.server_port}/v0",
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{llm_server.server_port}/v1",
+        'OPENAI_API_KEY': 'benchmark',
+        'ENRICH_ALLOW_PRIVATE': '1',  # the fake articles are served from 127.0.0.1
+        'METRICS_LOG': '',
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    # Agent output is noise here; keep only the benchmark report on stdout
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        results = {'cycles': bench_cycles(args, hn, llm)}
+        sizes = [int(size) for size in args.scale.split(',') if size.strip()]
+        results['scaling'] = bench_scaling(sizes) if sizes else []
+        results['cold_start'] = bench_cold_start(hn, args.cold_start) if args.cold_start else {}
+        results['sources'] = {} if args.no_sources else check_sources(feeds)
+        results['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    print(json.dumps(results, indent=2))
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if args.max_p95_ms is not None and results['cycles']['cycle_p95_ms'] > args.max_p95_ms:
+        failures.append(f"cycle p95 {results['cycles']['cycle_p95_ms']}ms > {args.max_p95_ms}ms")
+    if args.max_requests_per_cycle is not None and results['cycles']['hn_requests_per_cycle'] > args.max_requests_per_cycle:
+        failures.append(f"HN requests/cycle {results['cycles']['hn_requests_per_cycle']} > {args.max_requests_per_cycle}")
+    if args.max_cold_start_ms is not None and results['cold_start'] and \
+            results['cold_start']['warm_run_ms'] > args.max_cold_start_ms:
+        failures.append(f"warm --once run {results['cold_start']['warm_run_ms']}ms > {args.max_cold_start_ms}ms")
+    for check, passed in results['sources'].get('checks', {}).items():
+        if not passed:
+            failures.append(f"source check {check} failed")
+    for failure in failures:
+        print(f"❌ Regression: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
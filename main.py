@@ -5,19 +5,64 @@ Continuously monitors AI/tech news, saves insights to CSV, and generates periodi
 Designed to run indefinitely without user interaction while managing API costs.
 """
 
+import time
+_IMPORT_STARTED = time.perf_counter()  # cold-start accounting (see run_once)
+
 import os
+import argparse
+import array
+import asyncio
+import atexit
+import codecs
+import collections
 import json
-import requests
-import time
 import csv
 import datetime
-from openai import OpenAI
+import email.utils
+import hashlib
+import html.parser
+import ipaddress
+import random
+import re
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import urllib.parse
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from pathlib import Path
+from xml.etree import ElementTree
+
+# openai, requests, http.server and numpy are imported where first used: together they
+# cost most of a cold start, and a cycle with nothing new never needs openai at all.
 
 # PocketFlow implementation (100 lines)
-import warnings, copy
+import warnings, copy, contextvars
+
+class DeadlineExceeded(TimeoutError): pass
+
+class Deadline:
+    """Wall-clock budget of one flow run (expires=None: unbounded), shared by all its nodes"""
+    def __init__(self,seconds=None): self.expires=None if seconds is None else time.monotonic()+seconds
+    def remaining(self): return float('inf') if self.expires is None else max(0.0,self.expires-time.monotonic())
+    @property
+    def expired(self): return self.remaining()<=0
+    def within(self,seconds):
+        d=Deadline(seconds); d.expires=min((e for e in (self.expires,d.expires) if e is not None),default=None); return d
+    def extend(self,seconds):
+        if self.expires is not None: self.expires+=seconds
+    def timeout(self,default=None):
+        left=self.remaining()
+        if left<=0: raise DeadlineExceeded("cycle budget exhausted")
+        return default if left==float('inf') else left if default is None else min(default,left)
+
+_deadline=contextvars.ContextVar('deadline',default=Deadline())
+def current_deadline(): return _deadline.get()
 
 class BaseNode:
+    deadline=Deadline()  # set by the running Flow before each node runs
     def __init__(self): self.params,self.successors={},{}
     def set_params(self,params): self.params=params
     def next(self,node,action="default"):
@@ -27,7 +72,9 @@ class BaseNode:
     def exec(self,prep_res): pass
     def post(self,shared,prep_res,exec_res): pass
     def _exec(self,prep_res): return self.exec(prep_res)
-    def _run(self,shared): p=self.prep(shared); e=self._exec(p); return self.post(shared,p,e)
+    def _run(self,shared):
+        t0=time.perf_counter(); p=self.prep(shared); t1=time.perf_counter(); e=self._exec(p); t2=time.perf_counter(); a=self.post(shared,p,e)
+        self.timings=(t1-t0,t2-t1,time.perf_counter()-t2); return a
     def run(self,shared): 
         if self.successors: warnings.warn("Node won't run successors. Use Flow.")  
         return self._run(shared)
@@ -41,16 +88,19 @@ class _ConditionalTransition:
     def __rshift__(self,tgt): return self.src.next(tgt,self.action)
 
 class Node(BaseNode):
-    def __init__(self,max_retries=1,wait=0): super().__init__(); self.max_retries,self.wait=max_retries,wait
+    def __init__(self,max_retries=1,wait=0): super().__init__(); self.max_retries,self.wait,self.retries=max_retries,wait,0
     def exec_fallback(self,prep_res,exc): raise exc
     def _exec(self,prep_res):
         for self.cur_retry in range(self.max_retries):
             try: return self.exec(prep_res)
             except Exception as e:
-                if self.cur_retry==self.max_retries-1: return self.exec_fallback(prep_res,e)
-                if self.wait>0: time.sleep(self.wait)
+                if self.cur_retry==self.max_retries-1 or self.deadline.expired: return self.exec_fallback(prep_res,e)
+                self.retries+=1
+                if self.wait>0: time.sleep(min(self.wait,self.deadline.remaining()))
 
 class Flow(BaseNode):
+    observer=None  # optional callable(node,action) invoked after every step, e.g. for metrics
+    budget=None    # optional seconds per run; nodes see the run's Deadline as self.deadline and current_deadline()
     def __init__(self,start=None): super().__init__(); self.start_node=start
     def start(self,start): self.start_node=start; return start
     def get_next_node(self,curr,action):
@@ -59,78 +109,1306 @@ class Flow(BaseNode):
         return nxt
     def _orch(self,shared,params=None):
         curr,p,last_action =copy.copy(self.start_node),(params or {**self.params}),None
-        while curr: curr.set_params(p); last_action=curr._run(shared); curr=copy.copy(self.get_next_node(curr,last_action))
+        dl=self.deadline.within(self.budget); token=_deadline.set(dl)
+        try:
+            while curr:
+                curr.set_params(p); curr.deadline=dl; last_action=curr._run(shared)
+                if self.observer: self.observer(curr,last_action)
+                curr=copy.copy(self.get_next_node(curr,last_action))
+        finally: _deadline.reset(token)
         return last_action
     def _run(self,shared): p=self.prep(shared); o=self._orch(shared); return self.post(shared,p,o)
     def post(self,shared,prep_res,exec_res): return exec_res
 
+class BatchNode(Node):
+    def _exec(self,items): return [super(BatchNode,self)._exec(i) for i in (items or [])]
+
+class BatchFlow(Flow):
+    def _run(self,shared):
+        pr=self.prep(shared) or []
+        for bp in pr: self._orch(shared,{**self.params,**bp})
+        return self.post(shared,pr,None)
+
+class AsyncNode(Node):
+    async def prep_async(self,shared): pass
+    async def exec_async(self,prep_res): pass
+    async def exec_fallback_async(self,prep_res,exc): raise exc
+    async def post_async(self,shared,prep_res,exec_res): pass
+    async def _exec(self,prep_res):
+        for self.cur_retry in range(self.max_retries):
+            try: return await self.exec_async(prep_res)
+            except Exception as e:
+                if self.cur_retry==self.max_retries-1 or self.deadline.expired: return await self.exec_fallback_async(prep_res,e)
+                self.retries+=1
+                if self.wait>0: await asyncio.sleep(min(self.wait,self.deadline.remaining()))
+    async def run_async(self,shared):
+        if self.successors: warnings.warn("Node won't run successors. Use AsyncFlow.")
+        return await self._run_async(shared)
+    async def _run_async(self,shared):
+        t0=time.perf_counter(); p=await self.prep_async(shared); t1=time.perf_counter(); e=await self._exec(p); t2=time.perf_counter(); a=await self.post_async(shared,p,e)
+        self.timings=(t1-t0,t2-t1,time.perf_counter()-t2); return a
+    def _run(self,shared): raise RuntimeError("Use run_async.")
+
+class AsyncBatchNode(AsyncNode,BatchNode):
+    async def _exec(self,items): return [await super(AsyncBatchNode,self)._exec(i) for i in (items or [])]
+
+class AsyncParallelBatchNode(AsyncNode,BatchNode):
+    async def _exec(self,items): return await asyncio.gather(*(super(AsyncParallelBatchNode,self)._exec(i) for i in (items or [])))
+
+class AsyncFlow(Flow,AsyncNode):
+    async def _orch_async(self,shared,params=None):
+        curr,p,last_action =copy.copy(self.start_node),(params or {**self.params}),None
+        dl=self.deadline.within(self.budget); token=_deadline.set(dl)
+        try:
+            while curr:
+                curr.set_params(p); curr.deadline=dl; last_action=await curr._run_async(shared) if isinstance(curr,AsyncNode) else curr._run(shared)
+                if self.observer: self.observer(curr,last_action)
+                curr=copy.copy(self.get_next_node(curr,last_action))
+        finally: _deadline.reset(token)
+        return last_action
+    async def _run_async(self,shared): p=await self.prep_async(shared); o=await self._orch_async(shared); return await self.post_async(shared,p,o)
+    async def post_async(self,shared,prep_res,exec_res): return exec_res
+
+# Configuration (override via environment variables)
+HN_API_BASE = os.getenv("HN_API_BASE", "https://hacker-news.firebaseio.com/v0")
+HN_SCAN_DEPTH = int(os.getenv("HN_SCAN_DEPTH", "500"))          # topstories IDs to inspect (max 500)
+HN_FETCH_CONCURRENCY = int(os.getenv("HN_FETCH_CONCURRENCY", "32"))
+HN_MAX_STORIES = int(os.getenv("HN_MAX_STORIES", "30"))         # 0 = keep every relevant story
+HN_ITEM_TTL_MINUTES = float(os.getenv("HN_ITEM_TTL_MINUTES", "60"))  # refetch cached items (scores) after this
+FETCH_REUSE_SECONDS = float(os.getenv("FETCH_REUSE_SECONDS", "30"))  # profiles polling within this share one fetch
+CYCLE_BUDGET_SECONDS = float(os.getenv("CYCLE_BUDGET_SECONDS", "180"))  # per collection cycle / analysis batch (0 = unbounded)
+AGENT_DB = os.getenv("AGENT_DB", "agent_state.db")             # SQLite file for indexed agent state
+SEEN_TTL_DAYS = float(os.getenv("SEEN_TTL_DAYS", "0"))          # 0 = remember seen stories forever
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))   # 0 = never expire
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))    # provider request limit
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))     # provider token limit
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))                 # adaptive limit ceiling
+LLM_TARGET_LATENCY_SECONDS = float(os.getenv("LLM_TARGET_LATENCY_SECONDS", "30"))  # slower calls shrink the limit
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))                       # per request, incl. 429 retries
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1"))               # first retry delay (full jitter)
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "60"))
+LLM_DAILY_BUDGET_USD = float(os.getenv("LLM_DAILY_BUDGET_USD", "1.0"))          # hard daily cap (0 = no cap)
+LLM_INPUT_USD_PER_MTOK = float(os.getenv("LLM_INPUT_USD_PER_MTOK", "0.15"))      # gpt-4o-mini list prices
+LLM_OUTPUT_USD_PER_MTOK = float(os.getenv("LLM_OUTPUT_USD_PER_MTOK", "0.60"))
+RELEVANCE_KEYWORDS = os.getenv("RELEVANCE_KEYWORDS", (
+    "ai,llm,gpt,machine learning,artificial intelligence,neural network,openai,"
+    "tech,technology,startup,programming,software,data,database,algorithm"))  # keyword[:weight], ...
+RELEVANCE_THRESHOLD = float(os.getenv("RELEVANCE_THRESHOLD", "1.0"))
+POLL_MIN_SECONDS = float(os.getenv("POLL_MIN_SECONDS", "300"))      # busiest feed: poll every 5 minutes
+POLL_MAX_SECONDS = float(os.getenv("POLL_MAX_SECONDS", "3600"))     # quiet feed: back off to hourly
+POLL_BASE_SECONDS = float(os.getenv("POLL_BASE_SECONDS", "900"))    # interval at the target new-story rate
+POLL_TARGET_NEW_STORIES = float(os.getenv("POLL_TARGET_NEW_STORIES", "3"))
+ERROR_BACKOFF_SECONDS = float(os.getenv("ERROR_BACKOFF_SECONDS", "60"))
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))  # estimated title Jaccard (1 disables)
+NEAR_DUP_MAX_ITEMS = int(os.getenv("NEAR_DUP_MAX_ITEMS", "50000"))  # bounded index size (0 = unbounded)
+NEAR_DUP_WARM_ITEMS = 200000                                          # warm-up cap when unbounded
+RECENT_INSIGHTS_SIZE = int(os.getenv("RECENT_INSIGHTS_SIZE", "200"))  # ring buffer of latest insights
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv")              # "csv" or "sqlite"
+STORAGE_DB = os.getenv("STORAGE_DB", AGENT_DB)                       # SQLite backend file
+STORAGE_FLUSH_RECORDS = int(os.getenv("STORAGE_FLUSH_RECORDS", "100"))  # buffer size before an automatic flush
+STORAGE_FSYNC = os.getenv("STORAGE_FSYNC", "0") == "1"               # fsync on every flush (durable, slower)
+METRICS_LOG = os.getenv("METRICS_LOG", "agent_metrics.jsonl")     # JSON-lines event log ("" disables)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))                  # Prometheus text endpoint (0 disables)
+AGENT_CONFIG_FILE = os.getenv("AGENT_CONFIG_FILE", "agent_config.json")
+ANALYSIS_TOKEN_BUDGET = int(os.getenv("ANALYSIS_TOKEN_BUDGET", "3000"))  # prompt tokens per analysis request
+ANALYSIS_MAX_BATCH = int(os.getenv("ANALYSIS_MAX_BATCH", "25"))          # stories per analysis request
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))       # analysis requests in flight
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))               # workers draining the queue per profile
+ENRICH_TOKEN_BUDGET = int(os.getenv("ENRICH_TOKEN_BUDGET", "150"))       # article excerpt per story (0 disables)
+ENRICH_MAX_BYTES = int(os.getenv("ENRICH_MAX_BYTES", "524288"))          # hard download cap per article
+ENRICH_TIMEOUT_SECONDS = float(os.getenv("ENRICH_TIMEOUT_SECONDS", "5"))  # hard wall-clock cap per article
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "8"))
+ENRICH_CACHE_TTL_HOURS = float(os.getenv("ENRICH_CACHE_TTL_HOURS", "72"))
+ENRICH_CACHE_MAX_ENTRIES = int(os.getenv("ENRICH_CACHE_MAX_ENTRIES", "20000"))
+ENRICH_ALLOW_PRIVATE = os.getenv("ENRICH_ALLOW_PRIVATE", "0") == "1"     # fetch links to private/loopback hosts (tests only)
+ENRICH_MAX_REDIRECTS = 5
+THEME_ENGINE = os.getenv("THEME_ENGINE", "local").lower()               # 'local' (NumPy clustering) or 'llm'
+THEME_FEATURES = int(os.getenv("THEME_FEATURES", "4096"))               # hashed TF-IDF dimensions
+THEME_SIMILARITY = float(os.getenv("THEME_SIMILARITY", "0.3"))          # cosine needed to join a theme
+THEME_MAX_CLUSTERS = int(os.getenv("THEME_MAX_CLUSTERS", "500"))        # least recently seen are dropped
+ENRICH_CONTENT_TYPES = {'text/html', 'application/xhtml+xml', 'text/plain'}
+QUEUE_LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "600"))     # leased stories return after this
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "5"))           # then parked as 'failed'
+QUEUE_RETRY_SECONDS = float(os.getenv("QUEUE_RETRY_SECONDS", "60"))      # first retry delay, doubling
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "30"))        # idle workers re-check the queue
+QUEUE_RETAIN_DAYS = float(os.getenv("QUEUE_RETAIN_DAYS", "7"))           # keep finished jobs this long
+ONCE_DRAIN_SECONDS = float(os.getenv("ONCE_DRAIN_SECONDS", "240"))        # --once stops leasing new batches after this
+AGENT_LOCK_FILE = os.getenv("AGENT_LOCK_FILE", "agent.lock")             # one agent process per working directory
+
+ANALYSIS_PROMPT = """Analyze each of these tech/AI news headlines (one JSON object per line, with an article excerpt when available).
+For EVERY headline return exactly one JSON object per line, nothing else:
+{{"id": <same id>, "theme": "<max 2 words>", "sentiment": "positive|negative|neutral", "insight": "<max 25 words>"}}
+
+Headlines:
+{stories}"""
+
+THEME_LABEL_PROMPT = """Name each of these tech news topics (one JSON object per line, with sample headlines).
+For EVERY topic return exactly one JSON object per line, nothing else:
+{{"id": <same id>, "theme": "<max 2 words>", "sentiment": "positive|negative|neutral", "insight": "<max 25 words>"}}
+
+Topics:
+{topics}"""
+
+REPORT_PROMPT = """Create a brief daily summary based on these tech trends:
+Themes today: {themes}
+Sentiments today: {sentiments}
+Top themes this week: {weekly}
+Latest insights: {insights}
+
+Provide: 1 key trend, overall sentiment, 1 prediction (max 80 words total)"""
+
+_http_session = None
+_http_session_lock = threading.Lock()
+_seen_store = None
+_relevance_matcher = None
+_hn_collector = None
+_insight_rollup = None
+_storage = None
+_metrics = None
+_sources = None
+_near_dup_index = None
+_work_queue = None
+_agent_lock = None
+_state_store = None
+_article_cache = None
+_theme_engine = None
+_openai_client = None
+_openai_client_lock = threading.Lock()
+_llm_cache = None
+_llm_gateway = None
+
+class Metrics:
+    """In-process counters and latency summaries with JSON-lines and Prometheus output
+
+    Recording is a lock plus a dict update, cheap enough to leave on. Events
+    (per node step, per cycle) are appended to METRICS_LOG as JSON lines;
+    aggregated values are exposed in Prometheus text format by serve().
+    """
+
+    def __init__(self, log_path=None):
+        self.log_path = METRICS_LOG if log_path is None else log_path
+        self.counters = collections.defaultdict(float)
+        self.summaries = {}      # key -> [count, sum, max]
+        self._lock = threading.Lock()
+        self._log = None
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[self._key(name, labels)] += value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self.summaries.setdefault(key, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+
+    def event(self, kind, **fields):
+        if not self.log_path:
+            return
+        line = json.dumps({'ts': datetime.datetime.now().isoformat(), 'event': kind, **fields}, default=str)
+        with self._lock:
+            if self._log is None:
+                self._log = open(self.log_path, 'a', encoding='utf-8', buffering=1)
+            self._log.write(line + "\n")
+
+    def snapshot(self):
+        with self._lock:
+            counters = {name + _format_labels(labels): value for (name, labels), value in self.counters.items()}
+            summaries = {name + _format_labels(labels): {'count': c, 'sum': round(s, 6), 'max': round(m, 6)}
+                         for (name, labels), (c, s, m) in self.summaries.items()}
+        return {'counters': counters, 'summaries': summaries}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"agent_{name}{_format_labels(labels)} {value:g}")
+            for (name, labels), (count, total, peak) in sorted(self.summaries.items()):
+                lines.append(f"agent_{name}_count{_format_labels(labels)} {count}")
+                lines.append(f"agent_{name}_sum{_format_labels(labels)} {total:.6f}")
+                lines.append(f"agent_{name}_max{_format_labels(labels)} {peak:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host='127.0.0.1'):
+        """Expose /metrics on a local daemon HTTP thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200 if self.path.startswith('/metrics') else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+def get_metrics():
+    """Return the process-wide metrics registry"""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+def record_node_metrics(node, action):
+    """Flow observer: per-node prep/exec/post latency, retries and outcome"""
+    metrics = get_metrics()
+    name = type(node).__name__
+    prep, exec_, post = getattr(node, 'timings', (0.0, 0.0, 0.0))
+    for phase, seconds in (('prep', prep), ('exec', exec_), ('post', post)):
+        metrics.observe('node_seconds', seconds, node=name, phase=phase)
+    retries = getattr(node, 'retries', 0)
+    if retries:
+        metrics.inc('node_retries_total', retries, node=name)
+    if node.deadline.expired:
+        metrics.inc('node_deadline_exceeded_total', node=name)
+    metrics.event('node', node=name, action=action, prep_s=round(prep, 6), exec_s=round(exec_, 6),
+                  post_s=round(post, 6), retries=retries)
+
 # Utility functions
-def call_llm(prompt, max_tokens=300):
-    """Call OpenAI API with cost-conscious settings"""
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def get_openai_client():
+    """Return the process-wide OpenAI client (reuses its connection pool)"""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            from openai import OpenAI
+            # Retries and timeouts are the gateway's job, so the client must not retry on its own
+            _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, timeout=LLM_TIMEOUT_SECONDS)
+        return _openai_client
+
+class LLMCache:
+    """Disk-backed LLM response cache with LRU size limit and TTL eviction
+
+    Keys are a hash of (model, prompt, max_tokens, temperature), so re-runs
+    after a crash and reports over unchanged data never pay twice.
+    """
+
+    def __init__(self, db_path=None, max_entries=None, ttl_seconds=None):
+        self.db_path = db_path or AGENT_DB
+        self.max_entries = LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl_seconds = LLM_CACHE_TTL_HOURS * 3600 if ttl_seconds is None else ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access);
+        """)
+
+    @staticmethod
+    def make_key(model, prompt, max_tokens, temperature):
+        payload = json.dumps([model, prompt, max_tokens, temperature], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached response or None, counting the hit/miss"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT response, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and (self.ttl_seconds <= 0 or now - row[1] <= self.ttl_seconds):
+                self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return row[0]
+            if row:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def put(self, key, response):
+        """Store a successful response, evicting least recently used entries past the limit"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)", (key, response, now, now))
+            if self.max_entries > 0:
+                self._conn.execute("""
+                    DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                    )""", (self.max_entries,))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0}
+
+def get_llm_cache():
+    """Return the process-wide LLM response cache"""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMCache()
+    return _llm_cache
+
+class LLMError(RuntimeError):
+    """An LLM request failed (after the gateway's retries, if it was retryable)"""
+
+class LLMUnavailable(LLMError):
+    """The gateway cannot serve requests right now (outage, rate limit or time budget), whatever the prompt"""
+
+class LLMBudgetExceeded(LLMUnavailable):
+    """The request would push today's LLM spend past LLM_DAILY_BUDGET_USD"""
+
+class AdaptiveConcurrencyLimit:
+    """AIMD limit on in-flight requests
+
+    Every call that finishes quickly raises the limit by 1/limit (about +1
+    per limit's worth of calls); a 429 or a call slower than the target
+    latency halves it. The limit stays within [1, max_limit].
+    """
+
+    def __init__(self, max_limit=None, target_latency=None, initial=None):
+        self.max_limit = max(1, LLM_MAX_CONCURRENCY if max_limit is None else max_limit)
+        self.target_latency = LLM_TARGET_LATENCY_SECONDS if target_latency is None else target_latency
+        self.limit = float(initial or max(1, self.max_limit // 2))
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Wait for a free slot; False if none frees up within `timeout` seconds"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency=None, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled or (latency is not None and latency > self.target_latency):
+                self.limit = max(1.0, self.limit / 2)
+            elif latency is not None:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+class LLMGateway:
+    """Rate-limited, budgeted and retrying access to the chat completions API
+
+    Each request takes from a requests/min and a tokens/min token bucket
+    (prompt estimate plus max_tokens), then a slot from an AIMD concurrency
+    limit. 429s, 5xx and connection errors are retried with exponential
+    backoff and full jitter (honouring Retry-After). Spend is priced from
+    reported usage (or the worst-case estimate when a response carries
+    none), kept per day and per calling node in llm_spend, and a
+    request whose worst-case cost would exceed the daily budget is refused
+    before it is sent.
+    """
+
+    def __init__(self, db_path=None, requests_per_minute=None, tokens_per_minute=None, daily_budget=None,
+                 max_attempts=None, concurrency=None):
+        self.db_path = db_path or AGENT_DB
+        requests_per_minute = LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        tokens_per_minute = LLM_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        self.request_bucket = TokenBucket(requests_per_minute / 60.0, capacity=max(1, requests_per_minute / 10))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, capacity=tokens_per_minute)
+        self.daily_budget = LLM_DAILY_BUDGET_USD if daily_budget is None else daily_budget
+        self.max_attempts = max(1, LLM_MAX_ATTEMPTS if max_attempts is None else max_attempts)
+        self.concurrency = concurrency or AdaptiveConcurrencyLimit()
+        self.throttled = 0
+        self._reserved = 0.0     # worst-case cost of requests in flight
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS llm_spend (
+                day TEXT NOT NULL,
+                node TEXT NOT NULL,
+                requests INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                cost_usd REAL NOT NULL,
+                PRIMARY KEY (day, node)
+            );
+        """)
+
+    @staticmethod
+    def cost(prompt_tokens, completion_tokens):
+        return (prompt_tokens * LLM_INPUT_USD_PER_MTOK + completion_tokens * LLM_OUTPUT_USD_PER_MTOK) / 1e6
+
+    def spent_today(self):
+        with self._lock:
+            row = self._conn.execute("SELECT SUM(cost_usd) FROM llm_spend WHERE day = ?",
+                                     (datetime.date.today().isoformat(),)).fetchone()
+        return row[0] or 0.0
+
+    def spend_by_node(self, days=1):
+        """{node: {'requests', 'prompt_tokens', 'completion_tokens', 'cost_usd'}} over the trailing days"""
+        since = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT node, SUM(requests), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd)
+                FROM llm_spend WHERE day >= ? GROUP BY node""", (since,)).fetchall()
+        return {node: {'requests': r, 'prompt_tokens': p, 'completion_tokens': c, 'cost_usd': round(cost, 6)}
+                for node, r, p, c, cost in rows}
+
+    def _reserve(self, estimate):
+        spent = self.spent_today()
+        with self._lock:
+            if self.daily_budget > 0 and spent + self._reserved + estimate > self.daily_budget:
+                raise LLMBudgetExceeded(f"daily LLM budget ${self.daily_budget:g} reached "
+                                        f"(spent ${spent:.4f}, ${self._reserved:.4f} in flight)")
+            self._reserved += estimate
+
+    def _record(self, caller, prompt_tokens, completion_tokens):
+        cost = self.cost(prompt_tokens, completion_tokens)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO llm_spend VALUES (?, ?, 1, ?, ?, ?)
+                ON CONFLICT (day, node) DO UPDATE SET requests = requests + 1,
+                    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                    completion_tokens = completion_tokens + excluded.completion_tokens,
+                    cost_usd = cost_usd + excluded.cost_usd
+            """, (datetime.date.today().isoformat(), caller, prompt_tokens, completion_tokens, cost))
+        metrics = get_metrics()
+        metrics.inc('llm_prompt_tokens_total', prompt_tokens, model=LLM_MODEL, node=caller)
+        metrics.inc('llm_completion_tokens_total', completion_tokens, model=LLM_MODEL, node=caller)
+        metrics.inc('llm_cost_usd_total', cost, model=LLM_MODEL, node=caller)
+
+    @staticmethod
+    def _retry_delay(attempt, error):
+        """Full-jitter exponential backoff, or the server's Retry-After if it asked for longer"""
+        delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_SECONDS * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            delay = max(delay, min(LLM_BACKOFF_MAX_SECONDS, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    @staticmethod
+    def _classify(error):
+        """(retryable, throttled) for an exception raised by the client"""
+        import openai  # already loaded by get_openai_client()
+        throttled = isinstance(error, openai.RateLimitError)
+        retryable = throttled or isinstance(error, openai.APIConnectionError) or \
+            (isinstance(error, openai.APIStatusError) and error.status_code >= 500)
+        return retryable, throttled
+
+    def complete(self, prompt, max_tokens=300, temperature=0.7, caller='unknown'):
+        """Return the completion text; raises LLMError (LLMUnavailable when the gateway, not the prompt, failed)
+
+        Request timeouts, rate-limit waits and retry backoff all stay within
+        the current flow's deadline; a retry that would overrun it is not made.
+        """
+        deadline = current_deadline()
+        if deadline.expired:
+            raise LLMUnavailable("cycle budget exhausted before the request")
+        prompt_tokens = estimate_tokens(prompt)
+        token_estimate = min(prompt_tokens + max_tokens, self.token_bucket.capacity)
+        estimate = self.cost(prompt_tokens, max_tokens)
+        self._reserve(estimate)
+        metrics = get_metrics()
+        try:
+            for attempt in range(self.max_attempts):
+                if not (self.request_bucket.acquire(timeout=deadline.timeout()) and
+                        self.token_bucket.acquire(token_estimate, timeout=deadline.timeout()) and
+                        self.concurrency.acquire(timeout=deadline.timeout())):
+                    raise LLMUnavailable("cycle budget exhausted waiting for the rate limit")
+                started = time.monotonic()
+                try:
+                    request_timeout = deadline.timeout(LLM_TIMEOUT_SECONDS)
+                except DeadlineExceeded:
+                    self.concurrency.release()
+                    raise
+                try:
+                    response = get_openai_client().chat.completions.create(
+                        model=LLM_MODEL,  # Using mini for cost efficiency
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        timeout=request_timeout
+                    )
+                except Exception as e:
+                    retryable, throttled = self._classify(e)
+                    self.concurrency.release(throttled=throttled)
+                    metrics.inc('llm_errors_total', model=LLM_MODEL, node=caller, throttled=throttled)
+                    if throttled:
+                        self.throttled += 1
+                    delay = self._retry_delay(attempt, e)
+                    if not retryable or attempt == self.max_attempts - 1 or delay >= deadline.remaining():
+                        raise (LLMUnavailable if retryable else LLMError)(f"{type(e).__name__}: {e}") from e
+                    print(f"⏳ LLM {'throttled' if throttled else 'error'} ({type(e).__name__}), "
+                          f"retry {attempt + 1}/{self.max_attempts - 1} in {delay:.1f}s "
+                          f"(concurrency limit {self.concurrency.limit:.1f})")
+                    time.sleep(delay)
+                    continue
+                latency = time.monotonic() - started
+                self.concurrency.release(latency=latency)
+                metrics.inc('llm_requests_total', model=LLM_MODEL, node=caller)
+                metrics.observe('llm_seconds', latency, model=LLM_MODEL)
+                usage = response.usage
+                if usage and usage.prompt_tokens is not None and usage.completion_tokens is not None:
+                    self._record(caller, usage.prompt_tokens, usage.completion_tokens)
+                else:
+                    # No usage reported (some proxies and compatible servers): charge the reserved worst case
+                    metrics.inc('llm_usage_missing_total', model=LLM_MODEL, node=caller)
+                    self._record(caller, prompt_tokens, max_tokens)
+                return (response.choices[0].message.content or "").strip()
+        except DeadlineExceeded as e:
+            raise LLMUnavailable(str(e)) from e
+        finally:
+            with self._lock:
+                self._reserved -= estimate
+
+    def stats(self):
+        return {'spent_today_usd': round(self.spent_today(), 4), 'budget_usd': self.daily_budget,
+                'concurrency_limit': round(self.concurrency.limit, 1), 'throttled': self.throttled}
+
+def get_llm_gateway():
+    """Return the process-wide LLM gateway"""
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway()
+    return _llm_gateway
+
+def call_llm(prompt, max_tokens=300, temperature=0.7, use_cache=True, caller='unknown', cache_if=None):
+    """Call the LLM through the gateway, served from cache when possible (raises LLMError)
+
+    With `cache_if`, a reply is only cached when cache_if(reply) is true, so
+    a reply the caller could not use is asked for again on the next try.
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = LLMCache.make_key(LLM_MODEL, prompt, max_tokens, temperature)
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            get_metrics().inc('llm_cache_hits_total')
+            stats = cache.stats()
+            print(f"🗃️  LLM cache hit ({stats['hits']} hits, {stats['misses']} misses)")
+            return cached
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Using mini for cost efficiency
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=0.7
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
+        content = get_llm_gateway().complete(prompt, max_tokens, temperature, caller)
+    except LLMError as e:
         print(f"LLM Error: {e}")
-        return f"Error: {str(e)}"
+        raise
+    
+    # Only successful (and, with cache_if, usable) completions are cached
+    if cache and (cache_if is None or cache_if(content)):
+        cache.put(key, content)
+    return content
+
+def get_http_session():
+    """Return the process-wide keep-alive HTTP session shared by all fetchers"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(HN_FETCH_CONCURRENCY, 10))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+class RelevanceMatcher:
+    """Weighted keyword/phrase matcher compiled once into a single regex
+
+    Keywords match as whole words (so 'ai' no longer hits "said" or
+    "Thailand", and 'c++' or '.net' still match), allow a plural 's', and phrases tolerate any whitespace.
+    The alternation is factored into a prefix trie so the regex engine
+    does not retry every keyword at every position. A title is relevant
+    when the summed weight of distinct keywords found reaches the threshold.
+    """
+
+    def __init__(self, keywords, threshold=1.0):
+        if not isinstance(keywords, dict):
+            keywords = {keyword: 1.0 for keyword in keywords}
+        self.weights = {" ".join(k.lower().split()): float(w) for k, w in keywords.items() if k.strip()}
+        self.threshold = threshold
+        # Lookarounds rather than \b, so keywords that start or end in a symbol (c++, c#, .net) still match
+        self.pattern = re.compile(rf"(?<!\w)(?:{self._trie_regex(self.weights)})s?(?!\w)")
+        # When any single keyword clears the threshold, the first hit decides
+        self._single_hit = bool(self.weights) and min(self.weights.values()) >= threshold
+
+    @staticmethod
+    def _trie_regex(keywords):
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        def build(node):
+            branches = [(r"\s+" if char == ' ' else re.escape(char)) + build(child)
+                        for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            return f"(?:{body})?" if '' in node else body
+
+        return build(trie)
+
+    def matches(self, title):
+        """Distinct keywords found in the title"""
+        found = set()
+        for text in self.pattern.findall((title or "").lower()):
+            text = " ".join(text.split())
+            if text not in self.weights and text.endswith('s'):
+                text = text[:-1]
+            found.add(text)
+        return found
+
+    def score(self, title):
+        return sum(self.weights.get(keyword, 0.0) for keyword in self.matches(title))
+
+    def is_relevant(self, title):
+        if self._single_hit:
+            return self.pattern.search((title or "").lower()) is not None
+        return self.score(title) >= self.threshold
+
+def parse_keywords(spec):
+    """Parse 'keyword[:weight], ...' into a weight dict"""
+    keywords = {}
+    for entry in spec.split(','):
+        keyword, _, weight = entry.partition(':')
+        if keyword.strip():
+            keywords[keyword.strip()] = float(weight) if weight.strip() else 1.0
+    return keywords
 
-def get_hackernews_stories():
-    """Fetch recent Hacker News stories about AI/tech"""
+def get_relevance_matcher():
+    """Return the process-wide matcher built from RELEVANCE_KEYWORDS"""
+    global _relevance_matcher
+    if _relevance_matcher is None:
+        _relevance_matcher = RelevanceMatcher(parse_keywords(RELEVANCE_KEYWORDS), RELEVANCE_THRESHOLD)
+    return _relevance_matcher
+
+def fetch_hn_json(path, session=None, base_url=None, timeout=10):
+    """GET a Hacker News API path (e.g. 'maxitem.json') and decode it"""
+    session = session or get_http_session()
+    response = session.get(f"{base_url or HN_API_BASE}/{path}", timeout=timeout)
+    metrics = get_metrics()
+    metrics.inc('http_requests_total', source='hn', status=response.status_code)
+    metrics.inc('http_response_bytes_total', len(response.content), source='hn')
+    response.raise_for_status()
+    return response.json()
+
+class HNCollector:
+    """Incremental Hacker News poller with a local item cache
+
+    Each poll reads maxitem.json and updates.json; topstories.json is only
+    re-read when either moved, and items are only fetched when they are
+    new, listed as changed in updates.json, or older than the per-item TTL
+    (which keeps scores fresh). Cache entries that fall out of the scanned
+    top list are evicted once stale.
+    """
+
+    def __init__(self, base_url=None, item_ttl=None, session=None, limiter=None):
+        self.base_url = base_url or HN_API_BASE
+        self.item_ttl = HN_ITEM_TTL_MINUTES * 60 if item_ttl is None else item_ttl
+        self.session = session
+        self.limiter = limiter   # default TokenBucket acquired before every request (poll() may pass its own)
+        self.items = {}          # id -> (item, fetched_at)
+        self.top_ids = []
+        self.top_fetched = 0.0
+        self.max_item = None
+        self.last_poll = None    # (finished at, scan depth, result) of the latest poll
+        self.last_poll_requests = 0
+        self._lock = threading.Lock()
+
+    def state(self):
+        """JSON-serializable poll state and item cache (see restore)"""
+        with self._lock:
+            return {'max_item': self.max_item, 'top_ids': self.top_ids, 'top_fetched': self.top_fetched,
+                    'items': [[story_id, item, fetched] for story_id, (item, fetched) in self.items.items()]}
+
+    def restore(self, state):
+        if not state:
+            return self
+        with self._lock:
+            self.max_item = state.get('max_item')
+            self.top_ids = state.get('top_ids', [])
+            self.top_fetched = state.get('top_fetched', 0.0)
+            self.items = {story_id: (item, fetched) for story_id, item, fetched in state.get('items', [])}
+        return self
+
+    def _get(self, path, timeout=10, deadline=None, limiter=None):
+        self.last_poll_requests += 1
+        return self._fetch(path, timeout, deadline, limiter)
+
+    def _fetch(self, path, timeout, deadline=None, limiter=None):
+        deadline = deadline or current_deadline()
+        limiter = limiter or self.limiter
+        if limiter and not limiter.acquire(timeout=deadline.timeout()):
+            raise DeadlineExceeded("cycle budget exhausted waiting for the rate limit")
+        return fetch_hn_json(path, self.session, self.base_url, deadline.timeout(timeout))
+
+    def poll(self, scan_depth=None, concurrency=None, reuse_seconds=None, limiter=None):
+        """Return (top story ids, {id: item}) fetching only what changed
+
+        A poll within `reuse_seconds` of the previous one (e.g. another
+        profile's cycle) returns that result without any requests. When the
+        flow's deadline runs out, the items fetched so far are returned and
+        the rest are left for the next poll. `limiter` (the calling source's
+        rate limit) overrides the collector's own for this poll.
+        """
+        scan_depth = scan_depth or HN_SCAN_DEPTH
+        concurrency = concurrency or HN_FETCH_CONCURRENCY
+        reuse_seconds = FETCH_REUSE_SECONDS if reuse_seconds is None else reuse_seconds
+        with self._lock:
+            if self.last_poll and time.time() - self.last_poll[0] < reuse_seconds and self.last_poll[1] >= scan_depth:
+                story_ids, items = self.last_poll[2]
+                print(f"🌐 HN poll: reused result from {time.time() - self.last_poll[0]:.0f}s ago")
+                return story_ids[:scan_depth], items
+            self.last_poll_requests = 0
+            now = time.time()
+            deadline = current_deadline()  # worker threads do not inherit the context
+            max_item = self._get("maxitem.json", deadline=deadline, limiter=limiter)
+            updates = self._get("updates.json", deadline=deadline, limiter=limiter) or {}
+            updated_ids = set(updates.get('items', []))
+            
+            # Ranking only moves when items are added or change (or rank decay outlives the TTL)
+            if (max_item != self.max_item or updated_ids & self.items.keys()
+                    or now - self.top_fetched > self.item_ttl):
+                self.top_ids = self._get("topstories.json", deadline=deadline, limiter=limiter)
+                self.top_fetched = now
+            self.max_item = max_item
+            story_ids = self.top_ids[:scan_depth]
+            
+            stale = [story_id for story_id in story_ids
+                     if story_id not in self.items
+                     or story_id in updated_ids
+                     or now - self.items[story_id][1] > self.item_ttl]
+            if stale:
+                pool = ThreadPoolExecutor(max_workers=concurrency)
+                futures = {pool.submit(self._fetch, f"item/{story_id}.json", 5, deadline, limiter): story_id
+                           for story_id in stale}
+                done, cut_short = 0, False
+                try:
+                    for future in as_completed(futures, timeout=deadline.timeout()):
+                        story_id = futures[future]
+                        done += 1
+                        self.last_poll_requests += 1
+                        try:
+                            self.items[story_id] = (future.result(), now)
+                        except Exception as e:
+                            print(f"⚠️  Error fetching story {story_id}: {e}")
+                except (FuturesTimeoutError, DeadlineExceeded):
+                    cut_short = True
+                    print(f"⏱️  Time budget exhausted: kept {done} of {len(stale)} item fetches, the rest wait for the next poll")
+                finally:
+                    pool.shutdown(wait=False, cancel_futures=True)
+            
+            # Bound the cache to the scanned window plus anything still fresh
+            keep = set(story_ids)
+            for story_id in [i for i, (_, fetched) in self.items.items() if i not in keep and now - fetched > self.item_ttl]:
+                del self.items[story_id]
+            
+            print(f"🌐 HN poll: {self.last_poll_requests} requests, {len(stale)} item(s) refreshed, {len(self.items)} cached")
+            result = story_ids, {story_id: self.items[story_id][0] for story_id in story_ids if story_id in self.items}
+            if not (stale and cut_short):
+                self.last_poll = (time.time(), scan_depth, result)  # a partial poll is never reused
+            return result
+
+def get_hn_collector():
+    """Return the process-wide incremental HN collector, resumed from the last run's state"""
+    global _hn_collector
+    if _hn_collector is None:
+        collector = HNCollector()
+        try:
+            collector.restore(get_state_store().get('hn_collector'))
+        except Exception as e:
+            print(f"⚠️  Could not restore HN collector state: {e}")
+        _hn_collector = collector
+    return _hn_collector
+
+def get_hackernews_stories(scan_depth=None, concurrency=None, max_stories=None, matcher=None, collector=None, limiter=None):
+    """Fetch recent Hacker News stories about AI/tech (raises if the poll fails)
+
+    Items come from the incremental collector, whose fetches fan out over a
+    bounded thread pool sharing one keep-alive session; only new or updated
+    items cost a request. Results keep topstories rank.
+    """
+    max_stories = HN_MAX_STORIES if max_stories is None else max_stories
+    matcher = matcher or get_relevance_matcher()
+    collector = collector or get_hn_collector()
     try:
-        print("🔍 Fetching Hacker News top stories...")
-        # Get top stories
-        top_stories_url = "https://hacker-news.firebaseio.com/v0/topstories.json"
-        response = requests.get(top_stories_url, timeout=10)
-        response.raise_for_status()
-        story_ids = response.json()[:15]
-        
-        print(f"📋 Retrieved {len(story_ids)} story IDs, filtering for AI/tech content...")
+        print("🔍 Polling Hacker News top stories...")
+        story_ids, items = collector.poll(scan_depth, concurrency, limiter=limiter)
+        print(f"📋 Checking {len(story_ids)} story IDs for AI/tech content...")
         
         stories = []
-        for i, story_id in enumerate(story_ids):
-            try:
-                story_url = f"https://hacker-news.firebaseio.com/v0/item/{story_id}.json"
-                story_response = requests.get(story_url, timeout=5)
-                story_response.raise_for_status()
-                story = story_response.json()
-                
-                if story and story.get('title'):
-                    title = story['title'].lower()
-                    if any(keyword in title for keyword in ['ai', 'llm', 'gpt', 'machine learning', 'artificial intelligence', 'tech', 'startup', 'programming', 'software', 'data', 'algorithm']):
-                        stories.append({
-                            'title': story['title'],
-                            'url': story.get('url', ''),
-                            'score': story.get('score', 0),
-                            'time': story.get('time', 0),
-                            'id': story_id
-                        })
-                        print(f"✅ Found relevant story: {story['title'][:60]}...")
-                        
-                        if len(stories) >= 5:
-                            break
-                    
-            except Exception as e:
-                print(f"⚠️  Error fetching story {story_id}: {e}")
-                continue
+        for story_id in story_ids:
+            story = items.get(story_id)
+            if story and story.get('title') and matcher.is_relevant(story['title']):
+                stories.append({
+                    'title': story['title'],
+                    'url': story.get('url', ''),
+                    'score': story.get('score', 0),
+                    'time': story.get('time', 0),
+                    'id': story_id
+                })
+                if max_stories and len(stories) >= max_stories:
+                    break
                 
         print(f"📰 Final collection: {len(stories)} relevant stories")
         return stories
         
     except Exception as e:
         print(f"❌ Error fetching Hacker News data: {e}")
-        return []
+        raise
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available now; otherwise return the seconds until they would be"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available; False if that would exceed `timeout` seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.try_acquire(tokens)
+            if delay == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            time.sleep(min(delay, 1.0))
+
+class Source:
+    """A story source: fetch() returns normalized story records
+
+    Every record has title, url, score, time, id and source. Each source
+    owns a token-bucket rate limit (requests per minute), a timeout, and a
+    conditional-GET cache so unchanged feeds cost a 304 and no parsing.
+    """
+
+    kind = 'base'
+
+    def __init__(self, name=None, url=None, rate_per_minute=60, timeout=10, filter_relevant=True, burst=None):
+        self.name = name or self.kind
+        self.url = url
+        self.timeout = timeout
+        self.filter_relevant = filter_relevant
+        self.limiter = TokenBucket(rate_per_minute / 60.0, capacity=burst or max(1, rate_per_minute // 10))
+        self._validators = {}    # url -> (etag, last_modified, parsed stories, fetched at)
+
+    def fetch(self, matcher=None):
+        """Stories from this source, filtered by `matcher` (default: the global keywords)"""
+        raise NotImplementedError
+
+    def conditional_get(self, url, parse):
+        """GET with If-None-Match/If-Modified-Since; a 304 reuses the last parsed result
+
+        Within FETCH_REUSE_SECONDS of the last fetch (another profile's
+        cycle) the cached result is returned without a request.
+        """
+        etag, last_modified, cached, fetched = self._validators.get(url, (None, None, None, 0))
+        if cached is not None and time.time() - fetched < FETCH_REUSE_SECONDS:
+            return cached
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        deadline = current_deadline()
+        if not self.limiter.acquire(timeout=deadline.timeout()):
+            raise DeadlineExceeded("cycle budget exhausted waiting for the rate limit")
+        response = get_http_session().get(url, headers=headers, timeout=deadline.timeout(self.timeout))
+        metrics = get_metrics()
+        metrics.inc('http_requests_total', source=self.name, status=response.status_code)
+        metrics.inc('http_response_bytes_total', len(response.content), source=self.name)
+        if response.status_code == 304 and cached is not None:
+            self._validators[url] = (etag, last_modified, cached, time.time())
+            return cached
+        response.raise_for_status()
+        parsed = parse(response)
+        self._validators[url] = (response.headers.get('ETag'), response.headers.get('Last-Modified'), parsed, time.time())
+        return parsed
+
+    def story(self, title, url='', story_id=None, score=0, timestamp=0):
+        return {
+            'title': " ".join((title or "").split()),
+            'url': url or '',
+            'score': score or 0,
+            'time': timestamp or 0,
+            'id': story_id if story_id is not None else f"{self.name}:{_digest(url or title)}",
+            'source': self.name,
+        }
+
+    def relevant(self, stories, matcher=None):
+        if not self.filter_relevant:
+            return stories
+        matcher = matcher or get_relevance_matcher()
+        return [story for story in stories if story['title'] and matcher.is_relevant(story['title'])]
+
+class HackerNewsSource(Source):
+    """Hacker News via the shared incremental collector
+
+    The burst covers a full scan (the three list requests plus
+    HN_SCAN_DEPTH items), so cold starts and TTL refreshes run at full
+    concurrency; the rate only paces polls that come back to back.
+    """
+
+    kind = 'hn'
 
-def save_to_csv(data, filename):
-    """Save data to CSV file with proper header handling"""
+    def __init__(self, name=None, rate_per_minute=3000, timeout=30, burst=None, **kwargs):
+        super().__init__(name, HN_API_BASE, rate_per_minute, timeout, burst=burst or HN_SCAN_DEPTH + 3, **kwargs)
+
+    def fetch(self, matcher=None):
+        stories = get_hackernews_stories(matcher=matcher, limiter=self.limiter)
+        for story in stories:
+            story['source'] = self.name
+        return stories
+
+def _parse_feed_time(text):
+    if not text:
+        return 0
+    try:
+        return int(email.utils.parsedate_to_datetime(text).timestamp())
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(datetime.datetime.fromisoformat(text.strip().replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return 0
+
+class RSSSource(Source):
+    """RSS 2.0 or Atom feed"""
+
+    kind = 'rss'
+    ATOM = '{http://www.w3.org/2005/Atom}'
+
+    def fetch(self, matcher=None):
+        return self.relevant(self.conditional_get(self.url, self.parse), matcher)
+
+    def parse(self, response):
+        root = ElementTree.fromstring(response.content)
+        stories = []
+        for item in root.iter('item'):
+            link = (item.findtext('link') or '').strip()
+            stories.append(self.story(item.findtext('title'), link,
+                                      f"{self.name}:{_digest(item.findtext('guid') or link)}",
+                                      timestamp=_parse_feed_time(item.findtext('pubDate'))))
+        for entry in root.iter(f'{self.ATOM}entry'):
+            links = entry.findall(f'{self.ATOM}link')
+            link = next((l.get('href') for l in links if l.get('rel', 'alternate') == 'alternate'), '')
+            stories.append(self.story(entry.findtext(f'{self.ATOM}title'), link or '',
+                                      f"{self.name}:{_digest(entry.findtext(f'{self.ATOM}id') or link or '')}",
+                                      timestamp=_parse_feed_time(entry.findtext(f'{self.ATOM}published')
+                                                                 or entry.findtext(f'{self.ATOM}updated'))))
+        return stories
+
+class JSONFeedSource(Source):
+    """JSON Feed (https://jsonfeed.org) or a plain JSON list of {title, url} objects"""
+
+    kind = 'json'
+
+    def fetch(self, matcher=None):
+        return self.relevant(self.conditional_get(self.url, self.parse), matcher)
+
+    def parse(self, response):
+        data = response.json()
+        items = data.get('items', []) if isinstance(data, dict) else data
+        return [self.story(item.get('title'), item.get('url') or item.get('external_url', ''),
+                           f"{self.name}:{_digest(str(item.get('id') or item.get('url') or item.get('title')))}",
+                           score=item.get('score', 0),
+                           timestamp=_parse_feed_time(item.get('date_published')))
+                for item in items if isinstance(item, dict)]
+
+SOURCE_TYPES = {source.kind: source for source in (HackerNewsSource, RSSSource, JSONFeedSource)}
+
+def build_sources(specs):
+    """Instantiate sources from config dicts like {"type": "rss", "url": ..., "rate_per_minute": 2}"""
+    sources = []
+    for spec in specs:
+        spec = dict(spec)
+        kind = spec.pop('type', 'hn')
+        if kind not in SOURCE_TYPES:
+            print(f"⚠️  Unknown source type '{kind}', skipping")
+            continue
+        sources.append(SOURCE_TYPES[kind](**spec))
+    return sources
+
+def get_sources():
+    """Return the process-wide source list: config "sources", else Hacker News only"""
+    global _sources
+    if _sources is None:
+        _sources = build_sources(load_agent_config().get('sources') or [{'type': 'hn'}])
+    return _sources
+
+async def collect_from_sources(sources, matcher=None):
+    """Fetch all sources concurrently; a slow or failing source only loses its own stories
+
+    Each source runs under its own deadline (its timeout, within the flow's
+    budget), so it stops by itself and hands back what it has fetched; the
+    hard timeout only allows it a moment past that.
+    Returns (stories, failed source names).
+    """
+    def fetch(source, deadline):
+        token = _deadline.set(deadline)
+        try:
+            return source.fetch(matcher)
+        finally:
+            _deadline.reset(token)
+    
+    async def run(source):
+        deadline = current_deadline().within(source.timeout)
+        return await asyncio.wait_for(asyncio.to_thread(fetch, source, deadline), deadline.remaining() + 1)
+
+    results = await asyncio.gather(*(run(source) for source in sources), return_exceptions=True)
+    stories, failed = [], []
+    for source, result in zip(sources, results):
+        if isinstance(result, BaseException):
+            reason = "timed out" if isinstance(result, asyncio.TimeoutError) else result
+            print(f"⚠️  Source {source.name} failed: {reason}")
+            get_metrics().inc('source_failures_total', source=source.name)
+            failed.append(source.name)
+            continue
+        print(f"📡 {source.name}: {len(result)} relevant stories")
+        stories.extend(result)
+    return stories, failed
+
+# Storage: every table has a versioned schema; backends append in buffered batches
+STORAGE_SCHEMAS = {
+    # table: (version, fields, indexed fields, time field that query(since=...) filters on)
+    'insights': (2, ['timestamp', 'story_id', 'title', 'theme', 'sentiment', 'insight', 'story_count'], ['timestamp', 'theme'], 'timestamp'),
+    'reports': (1, ['date', 'insights_analyzed', 'summary'], ['date'], 'date'),
+    'seen_log': (1, ['title', 'url', 'first_seen'], ['first_seen'], 'first_seen'),
+}
+STORAGE_FILES = {
+    'insights': 'agent_insights.csv',
+    'reports': 'daily_reports.csv',
+    'seen_log': 'seen_stories.csv',
+}
+
+class StorageBackend:
+    """Buffered append-only record storage
+
+    Records are validated against STORAGE_SCHEMAS, buffered, and written in
+    one batch per flush (every STORAGE_FLUSH_RECORDS records, on flush() and
+    on close). Subclasses implement _write_batch and query.
+    """
+
+    def __init__(self, flush_records=None, fsync=None):
+        self.flush_records = STORAGE_FLUSH_RECORDS if flush_records is None else flush_records
+        self.fsync = STORAGE_FSYNC if fsync is None else fsync
+        self._buffers = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+    def append(self, table, records):
+        if table not in STORAGE_SCHEMAS:
+            raise ValueError(f"Unknown storage table: {table}")
+        fields = STORAGE_SCHEMAS[table][1]
+        with self._lock:
+            buffer = self._buffers[table]
+            buffer.extend([record.get(field, '') for field in fields] for record in records)
+            if len(buffer) >= self.flush_records:
+                self._flush_table(table)
+
+    def flush(self):
+        with self._lock:
+            for table in list(self._buffers):
+                self._flush_table(table)
+
+    def _flush_table(self, table):
+        rows = self._buffers.pop(table, [])
+        if rows:
+            self._write_batch(table, rows)
+
+    def _write_batch(self, table, rows):
+        raise NotImplementedError
+
+    def query(self, table, since=None, theme=None, limit=None):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+class CSVBackend(StorageBackend):
+    """CSV files compatible with the original layout, kept open for appends
+
+    A file whose header differs from the current schema is upgraded once:
+    the old file is kept as <name>.pre-v<version> and its rows are rewritten
+    under the new header, so new fields can never shift existing columns.
+    """
+
+    def __init__(self, directory='.', files=None, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = Path(directory)
+        self.files = files or STORAGE_FILES
+        self._handles = {}
+
+    def _open(self, table):
+        if table in self._handles:
+            return self._handles[table]
+        version, fields, _, _ = STORAGE_SCHEMAS[table]
+        path = self.directory / self.files[table]
+        if path.exists() and path.stat().st_size > 0:
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                header = next(csv.reader(f), [])
+            if header != fields:
+                upgrade_csv_schema(path, fields, version)
+        handle = open(path, 'a', newline='', encoding='utf-8')
+        writer = csv.writer(handle)
+        if handle.tell() == 0:
+            writer.writerow(fields)
+        self._handles[table] = (handle, writer)
+        return handle, writer
+
+    def _write_batch(self, table, rows):
+        handle, writer = self._open(table)
+        writer.writerows(rows)
+        handle.flush()
+        if self.fsync:
+            os.fsync(handle.fileno())
+
+    def query(self, table, since=None, theme=None, limit=None):
+        self.flush()
+        path = self.directory / self.files[table]
+        if not path.exists():
+            return []
+        time_field = STORAGE_SCHEMAS[table][3]
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            rows = [row for row in csv.DictReader(f)
+                    if (since is None or row.get(time_field, '') >= since)
+                    and (theme is None or row.get('theme') == theme)]
+        return rows[-limit:] if limit else rows
+
+    def close(self):
+        super().close()
+        for handle, _ in self._handles.values():
+            handle.close()
+        self._handles.clear()
+
+class SQLiteBackend(StorageBackend):
+    """SQLite (WAL) tables with indexes on timestamp and theme, queryable at volume"""
+
+    def __init__(self, db_path=None, **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path or STORAGE_DB
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS schema_versions (name TEXT PRIMARY KEY, version INTEGER)")
+        for table, (version, fields, indexed, _) in STORAGE_SCHEMAS.items():
+            self._ensure_table(table, version, fields, indexed)
+
+    def _ensure_table(self, table, version, fields, indexed):
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (rowid INTEGER PRIMARY KEY, {', '.join(fields)})")
+            # Older versions only ever lack trailing fields, so upgrades just add columns
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for field in fields:
+                if field not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {field}")
+            for field in indexed:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{field} ON {table}({field})")
+            self._conn.execute("INSERT OR REPLACE INTO schema_versions VALUES (?, ?)", (table, version))
+
+    def _write_batch(self, table, rows):
+        fields = STORAGE_SCHEMAS[table][1]
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})", rows)
+
+    def query(self, table, since=None, theme=None, limit=None):
+        self.flush()
+        fields, time_field = STORAGE_SCHEMAS[table][1], STORAGE_SCHEMAS[table][3]
+        clauses, args = [], []
+        if since is not None:
+            clauses.append(f"{time_field} >= ?")
+            args.append(since)
+        if theme is not None:
+            clauses.append("theme = ?")
+            args.append(theme)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {', '.join(fields)} FROM {table} {where} ORDER BY rowid DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        rows = self._conn.execute(sql, args).fetchall()
+        return [dict(zip(fields, row)) for row in reversed(rows)]
+
+    def close(self):
+        super().close()
+        self._conn.close()
+
+def upgrade_csv_schema(path, fields, version):
+    """Rewrite a CSV under the current schema header, keeping the original as a backup"""
+    path = Path(path)
+    backup = path.with_name(f"{path.name}.pre-v{version}")
+    path.replace(backup)
+    with open(backup, 'r', newline='', encoding='utf-8') as src, \
+         open(path, 'w', newline='', encoding='utf-8') as dst:
+        writer = csv.DictWriter(dst, fieldnames=fields, extrasaction='ignore', restval='')
+        writer.writeheader()
+        writer.writerows(csv.DictReader(src))
+    print(f"🔧 Upgraded {path} to schema v{version} (original kept as {backup.name})")
+
+def migrate_csv_to_sqlite(directory='.', db_path=None):
+    """One-off import of the CSV files into the SQLite backend; returns rows per table"""
+    backend = SQLiteBackend(db_path, flush_records=5000)
+    migrated = {}
+    try:
+        for table, filename in STORAGE_FILES.items():
+            path = Path(directory) / filename
+            if not path.exists() or path.stat().st_size == 0:
+                continue
+            if backend._conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                print(f"⏭️  {backend.db_path}:{table} already has rows, skipping {path}")
+                continue
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            backend.append(table, rows)
+            migrated[table] = len(rows)
+            print(f"📦 Migrated {len(rows)} rows from {path} into {backend.db_path}:{table}")
+    finally:
+        backend.close()
+    return migrated
+
+def get_storage():
+    """Return the process-wide storage backend chosen by STORAGE_BACKEND"""
+    global _storage
+    if _storage is None:
+        _storage = SQLiteBackend() if STORAGE_BACKEND == 'sqlite' else CSVBackend()
+        atexit.register(_storage.close)
+    return _storage
+
+def save_to_csv(data, filename, storage=None):
+    """Save records for one of the STORAGE_FILES through the configured (or given) storage backend; True on success"""
     try:
-        file_exists = Path(filename).exists()
-        
         # Ensure data is in the right format
         if isinstance(data, dict):
             data_list = [data]
@@ -138,258 +1416,1890 @@ def save_to_csv(data, filename):
             data_list = data
         else:
             print(f"⚠️  Invalid data type for CSV: {type(data)}")
-            return
+            return False
         
         if not data_list:
             print(f"⚠️  No data to save to {filename}")
-            return
-            
-        fieldnames = data_list[0].keys()
+            return False
         
-        with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            # Only write header if file is new or empty
-            if not file_exists or os.path.getsize(filename) == 0:
-                writer.writeheader()
-            
-            writer.writerows(data_list)
+        table = {name: table for table, name in STORAGE_FILES.items()}.get(filename)
+        if table is None:
+            print(f"❌ No storage schema for {filename}")
+            return False
         
-        print(f"💾 Saved {len(data_list)} record(s) to {filename}")
+        (storage or get_storage()).append(table, data_list)
+        print(f"💾 Saved {len(data_list)} record(s) to {filename if STORAGE_BACKEND != 'sqlite' else table}")
+        return True
         
     except Exception as e:
         print(f"❌ Error saving to CSV {filename}: {e}")
+        return False
 
-def load_seen_stories():
-    """Load previously seen story titles from CSV to avoid duplicates"""
-    seen_stories = set()
-    seen_stories_file = 'seen_stories.csv'
-    
-    if Path(seen_stories_file).exists() and os.path.getsize(seen_stories_file) > 0:
+def normalize_title(title):
+    """Normalize a title for dedup: lowercase, collapse whitespace"""
+    return " ".join((title or "").lower().split())
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:20]
+
+class SeenStoryStore:
+    """Indexed on-disk record of stories already processed
+
+    Rows live in SQLite keyed by a hash of the normalized title (with a
+    secondary URL hash index); a warm in-memory key set is kept across
+    cycles so lookups never touch disk. The legacy seen_stories.csv is
+    imported once on first open.
+    """
+
+    def __init__(self, db_path=None, legacy_csv='seen_stories.csv'):
+        self.db_path = db_path or AGENT_DB
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS seen_stories (
+                key TEXT PRIMARY KEY,
+                url_key TEXT,
+                title TEXT NOT NULL,
+                url TEXT,
+                first_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_seen_url_key ON seen_stories(url_key);
+            CREATE INDEX IF NOT EXISTS idx_seen_first_seen ON seen_stories(first_seen);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+        """)
+        if legacy_csv:
+            self._import_legacy_csv(legacy_csv)
+        self._load_keys()
+
+    @staticmethod
+    def _keys_for(story):
+        if isinstance(story, str):
+            story = {'title': story}
+        title = normalize_title(story.get('title'))
+        url = (story.get('url') or '').strip()
+        return (_digest(title) if title else None), (_digest(url) if url else None)
+
+    def _load_keys(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT key, url_key FROM seen_stories").fetchall()
+            self._keys = {key for key, _ in rows}
+            self._url_keys = {url_key for _, url_key in rows if url_key}
+
+    def _import_legacy_csv(self, path):
+        done = self._conn.execute("SELECT value FROM meta WHERE name = 'legacy_csv_imported'").fetchone()
+        if done or not Path(path).exists() or os.path.getsize(path) == 0:
+            return
+        rows = []
         try:
-            with open(seen_stories_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if 'title' in row and row['title'].strip():
-                        seen_stories.add(row['title'].strip())
+            with open(path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    title = (row.get('title') or '').strip()
+                    if not title:
+                        continue
+                    try:
+                        first_seen = datetime.datetime.fromisoformat(row.get('first_seen', '')).timestamp()
+                    except ValueError:
+                        first_seen = time.time()
+                    rows.append((_digest(normalize_title(title)), None, title, '', first_seen))
         except Exception as e:
-            print(f"⚠️  Could not load seen stories: {e}")
-    
-    return seen_stories
+            print(f"⚠️  Could not import {path}: {e}")
+            return
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO seen_stories VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('legacy_csv_imported', ?)", (path,))
+        print(f"📥 Imported {len(rows)} seen stories from {path}")
+
+    def __len__(self):
+        return len(self._keys)
+
+    def contains(self, story):
+        """True if the story (dict or title string) was seen before, by title or URL"""
+        key, url_key = self._keys_for(story)
+        return key in self._keys or (url_key is not None and url_key in self._url_keys)
+
+    def add_many(self, stories):
+        """Record stories as seen in a single transaction; returns rows added"""
+        now = time.time()
+        rows = []
+        for story in stories:
+            if isinstance(story, str):
+                story = {'title': story}
+            key, url_key = self._keys_for(story)
+            if key is None or key in self._keys:
+                continue
+            rows.append((key, url_key, story['title'].strip(), story.get('url') or '', now))
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO seen_stories VALUES (?, ?, ?, ?, ?)", rows)
+            for key, url_key, *_ in rows:
+                self._keys.add(key)
+                if url_key:
+                    self._url_keys.add(url_key)
+        return len(rows)
+
+    def recent(self, limit):
+        """Most recently seen stories (oldest first) as {'title', 'url'} dicts"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT title, url FROM seen_stories ORDER BY first_seen DESC LIMIT ?", (limit,)).fetchall()
+        return [{'title': title, 'url': url} for title, url in reversed(rows)]
+
+    def expire_older_than(self, seconds):
+        """Forget stories first seen more than `seconds` ago; returns rows removed"""
+        cutoff = time.time() - seconds
+        with self._lock, self._conn:
+            removed = self._conn.execute("DELETE FROM seen_stories WHERE first_seen < ?", (cutoff,)).rowcount
+        if removed:
+            self._load_keys()
+        return removed
+
+def get_seen_store():
+    """Return the process-wide seen-story store"""
+    global _seen_store
+    if _seen_store is None:
+        _seen_store = SeenStoryStore()
+    return _seen_store
+
+TRACKING_PARAMS = {'ref', 'ref_src', 'source', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'igshid'}
+TITLE_STOPWORDS = {'a', 'an', 'the', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'by', 'with', 'at', 'from',
+                   'is', 'are', 'was', 'be', 'as', 'its', 'it', 'this', 'that', 'how', 'why', 'what', 'new'}
+
+def normalize_url(url):
+    """Canonical URL for comparison: no scheme/www/fragment/tracking params, sorted query"""
+    if not url:
+        return ''
+    parts = urllib.parse.urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted((k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS)
+    path = parts.path.rstrip('/') or ''
+    return host + path + ('?' + urllib.parse.urlencode(query) if query else '')
+
+def content_words(text):
+    """Content words of a text with crude suffix stripping ('released' ~ 'releases')"""
+    words = []
+    for word in re.findall(r"[a-z0-9]+", (text or '').lower()):
+        if word in TITLE_STOPWORDS:
+            continue
+        for suffix in ('ing', 'ed', 'es', 's'):
+            if len(word) > 4 and word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        words.append(word)
+    return words
+
+def title_tokens(title):
+    """Set of content words of a title"""
+    return set(content_words(title))
+
+class NearDuplicateIndex:
+    """MinHash LSH index over seen story titles plus a normalized-URL map
+
+    Titles become MinHash signatures over their content words; signatures
+    are split into bands and bucketed, so a lookup only compares against
+    stories sharing a band (sub-linear in history size). Candidates whose
+    estimated Jaccard similarity reaches the threshold, or whose normalized
+    URL matches, are reported. Signatures and band buckets live in SQLite
+    next to seen_stories, so opening the index costs nothing however long
+    the history is; with max_items set, the oldest entries are evicted.
+    db_path=None keeps a throwaway in-memory index.
+    """
+
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, db_path=None, threshold=None, num_perm=64, bands=16, max_items=None, min_tokens=3):
+        self.threshold = NEAR_DUP_THRESHOLD if threshold is None else threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_items = NEAR_DUP_MAX_ITEMS if max_items is None else max_items
+        self.min_tokens = min_tokens
+        rng = random.Random(1729)  # fixed seed: signatures must be stable across restarts
+        self._perms = [(rng.randrange(1, self.PRIME), rng.randrange(0, self.PRIME)) for _ in range(num_perm)]
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path or ':memory:', check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS near_dup_items (
+                item INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                url_key TEXT,
+                signature BLOB,                 -- uint64[num_perm], NULL for titles too short to sign
+                added REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_near_dup_url ON near_dup_items(url_key);
+            CREATE TABLE IF NOT EXISTS near_dup_bands (
+                band_key INTEGER NOT NULL,      -- band number and band values hashed to 64 bits
+                item INTEGER NOT NULL,
+                PRIMARY KEY (band_key, item)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM near_dup_items").fetchone()[0]
+
+    def signature(self, tokens):
+        hashes = [int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+                  for token in tokens]
+        return tuple(min((a * h + b) % self.PRIME for h in hashes) for a, b in self._perms)
+
+    def _band_keys(self, signature):
+        # Stable across processes and Python versions, unlike hash()
+        return [int.from_bytes(hashlib.blake2b(array.array('Q', (band, *signature[band * self.rows:(band + 1) * self.rows]))
+                                               .tobytes(), digest_size=8).digest(), 'big', signed=True)
+                for band in range(self.bands)]
+
+    def prepare(self, story):
+        """(signature or None, normalized url) for a story; pass it to find()/add() to hash only once"""
+        tokens = title_tokens(story.get('title'))
+        signature = self.signature(tokens) if len(tokens) >= self.min_tokens else None
+        return signature, normalize_url(story.get('url'))
+
+    def find(self, story, prepared=None):
+        """Return (matching title, similarity) for the closest near-duplicate, or None"""
+        signature, url_key = prepared or self.prepare(story)
+        with self._lock:
+            if url_key:
+                row = self._conn.execute("SELECT title FROM near_dup_items WHERE url_key = ? LIMIT 1",
+                                         (url_key,)).fetchone()
+                if row:
+                    return row[0], 1.0
+            if signature is None:
+                return None
+            band_keys = self._band_keys(signature)
+            candidates = self._conn.execute(f"""
+                SELECT title, signature FROM near_dup_items WHERE item IN (
+                    SELECT item FROM near_dup_bands WHERE band_key IN ({','.join('?' * len(band_keys))}))
+            """, band_keys).fetchall()
+        best = None
+        for title, blob in candidates:
+            other = array.array('Q', blob)
+            similarity = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (title, similarity)
+        return best
+
+    def add(self, story, prepared=None):
+        self.add_many([story], [prepared] if prepared else None)
+
+    def add_many(self, stories, prepared=None):
+        """Index stories in one transaction (prepared: matching list of prepare() results)"""
+        prepared = prepared or [self.prepare(story) for story in stories]
+        now = time.time()
+        with self._lock, self._conn:
+            for story, (signature, url_key) in zip(stories, prepared):
+                item = self._conn.execute(
+                    "INSERT INTO near_dup_items (title, url_key, signature, added) VALUES (?, ?, ?, ?)",
+                    (story.get('title', ''), url_key or None,
+                     array.array('Q', signature).tobytes() if signature is not None else None, now)).lastrowid
+                if signature is not None:
+                    self._conn.executemany("INSERT INTO near_dup_bands VALUES (?, ?)",
+                                           [(band_key, item) for band_key in self._band_keys(signature)])
+            if self.max_items:
+                newest = self._conn.execute("SELECT MAX(item) FROM near_dup_items").fetchone()[0] or 0
+                self._delete_where("item <= ?", newest - self.max_items)
+
+    def backfill(self, seen_store):
+        """Index the store's most recent stories once (the first open after an upgrade)"""
+        if self._conn.execute("SELECT value FROM meta WHERE name = 'near_dup_backfilled'").fetchone():
+            return
+        stories = seen_store.recent(self.max_items or NEAR_DUP_WARM_ITEMS)
+        self.add_many(stories)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('near_dup_backfilled', ?)", (str(len(stories)),))
+        if stories:
+            print(f"📥 Indexed {len(stories)} seen stories for near-duplicate detection")
+
+    def expire_older_than(self, seconds):
+        """Forget entries added more than `seconds` ago (mirrors SEEN_TTL_DAYS)"""
+        with self._lock, self._conn:
+            self._delete_where("added < ?", time.time() - seconds)
+
+    def _delete_where(self, condition, value):
+        rows = self._conn.execute(f"SELECT item, signature FROM near_dup_items WHERE {condition}", (value,)).fetchall()
+        self._conn.executemany("DELETE FROM near_dup_bands WHERE band_key = ? AND item = ?",
+                               [(band_key, item) for item, blob in rows if blob
+                                for band_key in self._band_keys(tuple(array.array('Q', blob)))])
+        self._conn.execute(f"DELETE FROM near_dup_items WHERE {condition}", (value,))
+
+def build_near_dup_index(seen_store):
+    """The near-duplicate index stored next to the seen stories (signatures are computed once per story)"""
+    index = NearDuplicateIndex(seen_store.db_path)
+    index.backfill(seen_store)
+    return index
+
+def get_near_dup_index():
+    """Return the process-wide near-duplicate index, warmed from recent seen stories"""
+    global _near_dup_index
+    if _near_dup_index is None:
+        _near_dup_index = build_near_dup_index(get_seen_store())
+    return _near_dup_index
+
+class ArticleTextExtractor(html.parser.HTMLParser):
+    """Incremental main-text extractor: feed() HTML chunks as they arrive, then text()
+
+    Text inside scripts, styles and page chrome (nav, header, footer, ...)
+    is dropped, and only blocks with at least `min_words` words are kept,
+    which skips menus and link lists. `done` turns true once `max_chars`
+    are collected so the caller can stop downloading.
+    """
+
+    SKIP = {'script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form', 'svg', 'iframe',
+            'template', 'button', 'select'}
+    BLOCKS = {'p', 'article', 'section', 'main', 'div', 'li', 'h1', 'h2', 'h3', 'h4', 'blockquote', 'pre',
+              'td', 'br', 'tr', 'dd', 'figcaption'}
+
+    def __init__(self, max_chars, min_words=6):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.min_words = min_words
+        self.description = ''
+        self._parts = []
+        self._size = 0
+        self._block = []
+        self._skip_depth = 0
+
+    @property
+    def done(self):
+        return self._size >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag in self.BLOCKS:
+            self._end_block()
+        elif tag == 'meta' and not self.description:
+            attrs = dict(attrs)
+            if (attrs.get('name') or attrs.get('property') or '').lower() in ('description', 'og:description'):
+                self.description = " ".join((attrs.get('content') or '').split())
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCKS:
+            self._end_block()
+
+    def handle_data(self, data):
+        if not self._skip_depth and not self.done:
+            self._block.append(data)
+
+    def _end_block(self):
+        words = " ".join(self._block).split()
+        self._block = []
+        if len(words) >= self.min_words and not self.done:
+            self._parts.append(" ".join(words))
+            self._size += sum(len(word) + 1 for word in words)
+
+    def text(self):
+        self._end_block()
+        return " ".join(self._parts) or self.description
+
+def truncate_to_tokens(text, budget):
+    """Cut text to roughly `budget` tokens at a word boundary"""
+    limit = budget * 4
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + "…"
+
+def blocked_url_reason(url, allow_private=None):
+    """Why an article link must not be fetched ('blocked_scheme', 'blocked_address', 'dns_error'), or None
 
-def save_seen_story(title):
-    """Save a story title to the seen stories file"""
+    Story links come from strangers, so only http(s) URLs whose host
+    resolves exclusively to public addresses are allowed; anything that
+    reaches loopback, private, link-local (cloud metadata), multicast or
+    reserved ranges is refused unless ENRICH_ALLOW_PRIVATE is set.
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return 'blocked_scheme'
+    if ENRICH_ALLOW_PRIVATE if allow_private is None else allow_private:
+        return None
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        infos = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError, ValueError):
+        return 'dns_error'
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if getattr(address, 'ipv4_mapped', None):
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            return 'blocked_address'
+    return None
+
+def _shutdown_response(response):
+    """Cut a streamed response's socket so a read blocked in another thread returns at once"""
+    fp = getattr(getattr(response.raw, '_fp', None), 'fp', None)
+    sock = getattr(getattr(fp, 'raw', None), '_sock', None)
     try:
-        if not title or not title.strip():
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+def fetch_article_text(url, max_chars, max_bytes=None, timeout=None, session=None, deadline=None, allow_private=None):
+    """Stream an article and extract its main text; returns (text, status)
+
+    Only ENRICH_CONTENT_TYPES are read. The body is decoded and parsed
+    chunk by chunk and the download stops at max_chars of text, max_bytes
+    or the wall-clock timeout (capped by the flow's deadline), whichever
+    comes first, so memory stays bounded however large the page is. The
+    timeout is enforced by a timer that shuts the socket down, since a
+    server trickling bytes would reset a per-read timeout forever.
+    Redirects are followed by hand (at most ENRICH_MAX_REDIRECTS) so every
+    hop is checked with blocked_url_reason() before it is requested.
+    """
+    max_bytes = max_bytes or ENRICH_MAX_BYTES
+    timeout = (deadline or current_deadline()).timeout(timeout or ENRICH_TIMEOUT_SECONDS)
+    stop_at = time.monotonic() + timeout
+    session = session or get_http_session()
+    metrics = get_metrics()
+    for _ in range(ENRICH_MAX_REDIRECTS + 1):
+        blocked = blocked_url_reason(url, allow_private)
+        if blocked:
+            metrics.inc('http_requests_total', source='article', status=blocked)
+            return '', blocked
+        remaining = max(0.1, stop_at - time.monotonic())
+        response = session.get(url, stream=True, allow_redirects=False, timeout=(min(remaining, 3.05), remaining),
+                               headers={'Accept': 'text/html,application/xhtml+xml,text/plain;q=0.9'})
+        if not response.is_redirect:
+            break
+        metrics.inc('http_requests_total', source='article', status=response.status_code)
+        url = urllib.parse.urljoin(url, response.headers['Location'])
+        response.close()
+    else:
+        return '', 'too_many_redirects'
+    watchdog = threading.Timer(max(0.0, stop_at - time.monotonic()), _shutdown_response, (response,))
+    watchdog.daemon = True
+    watchdog.start()
+    with response:
+        metrics.inc('http_requests_total', source='article', status=response.status_code)
+        if response.status_code >= 400:
+            return '', f'http_{response.status_code}'
+        content_type, _, params = response.headers.get('Content-Type', '').partition(';')
+        if content_type.strip().lower() not in ENRICH_CONTENT_TYPES:
+            return '', 'skipped_type'
+        charset = re.search(r'charset=["\']?([\w-]+)', params)
+        try:
+            decoder = codecs.getincrementaldecoder(charset.group(1) if charset else 'utf-8')(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        plain = content_type.strip().lower() == 'text/plain'
+        extractor = None if plain else ArticleTextExtractor(max_chars)
+        plain_text, received, status = [], 0, 'ok'
+        try:
+            for chunk in response.iter_content(16384):
+                received += len(chunk)
+                text = decoder.decode(chunk)
+                if plain:
+                    plain_text.append(text)
+                    if sum(map(len, plain_text)) >= max_chars:
+                        break
+                else:
+                    extractor.feed(text)
+                    if extractor.done:
+                        break
+                if received >= max_bytes:
+                    status = 'truncated'
+                    break
+                if time.monotonic() > stop_at:
+                    status = 'timeout'
+                    break
+        except Exception:
+            if time.monotonic() < stop_at:
+                raise
+            status = 'timeout'  # the watchdog cut the connection; keep what arrived
+        finally:
+            watchdog.cancel()
+        if time.monotonic() >= stop_at and status == 'ok' and not (extractor and extractor.done):
+            status = 'timeout'
+        metrics.inc('http_response_bytes_total', received, source='article')
+    text = " ".join("".join(plain_text).split()) if plain else extractor.text()
+    return text, status
+
+class ArticleCache:
+    """Article excerpts keyed by normalized URL, with TTL and an LRU size bound
+
+    Failures are cached too, so re-posted links and retried stories never
+    trigger a second download within the TTL.
+    """
+
+    def __init__(self, db_path=None, ttl_seconds=None, max_entries=None):
+        self.db_path = db_path or AGENT_DB
+        self.ttl_seconds = ENRICH_CACHE_TTL_HOURS * 3600 if ttl_seconds is None else ttl_seconds
+        self.max_entries = ENRICH_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS article_cache (
+                url_key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL,
+                fetched REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_article_cache_fetched ON article_cache(fetched);
+        """)
+
+    @staticmethod
+    def key(url):
+        return _digest(normalize_url(url))
+
+    def get(self, url):
+        """(text, status) if cached and fresh, else None"""
+        with self._lock:
+            row = self._conn.execute("SELECT text, status, fetched FROM article_cache WHERE url_key = ?",
+                                     (self.key(url),)).fetchone()
+        if row and (self.ttl_seconds <= 0 or time.time() - row[2] <= self.ttl_seconds):
+            return row[0], row[1]
+        return None
+
+    def put_many(self, entries):
+        """Store {url: (text, status)} in one transaction, evicting the oldest past max_entries"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO article_cache VALUES (?, ?, ?, ?)",
+                                   [(self.key(url), text, status, now) for url, (text, status) in entries.items()])
+            if self.max_entries > 0:
+                self._conn.execute("""
+                    DELETE FROM article_cache WHERE url_key IN (
+                        SELECT url_key FROM article_cache ORDER BY fetched DESC LIMIT -1 OFFSET ?
+                    )""", (self.max_entries,))
+
+def get_article_cache():
+    """Return the process-wide article cache"""
+    global _article_cache
+    if _article_cache is None:
+        _article_cache = ArticleCache()
+    return _article_cache
+
+def enrich_stories(stories, token_budget=None, concurrency=None, cache=None):
+    """Attach story['text'], a token-capped article excerpt, from cache or concurrent fetches
+
+    Fetches still pending when the flow's deadline runs out are dropped
+    (and not cached); their stories are analyzed without text.
+    Returns {'cached': n, 'fetched': n, 'failed': n}.
+    """
+    token_budget = ENRICH_TOKEN_BUDGET if token_budget is None else token_budget
+    if token_budget <= 0:
+        return {'cached': 0, 'fetched': 0, 'failed': 0}
+    cache = cache or get_article_cache()
+    results, to_fetch = {}, {}
+    for story in stories:
+        url = story.get('url') or ''
+        if not url.startswith(('http://', 'https://')) or url in results or url in to_fetch:
+            continue
+        cached = cache.get(url)
+        if cached is not None:
+            results[url] = cached
+        else:
+            to_fetch[url] = None
+    counts = {'cached': len(results), 'fetched': 0, 'failed': 0}
+    
+    if to_fetch:
+        fetched = {}
+        deadline = current_deadline()
+        pool = ThreadPoolExecutor(max_workers=concurrency or ENRICH_CONCURRENCY)
+        # Extract a little past the budget so truncation lands on a word boundary
+        futures = {pool.submit(fetch_article_text, url, token_budget * 4 + 200, deadline=deadline): url
+                   for url in to_fetch}
+        try:
+            for future in as_completed(futures, timeout=deadline.timeout()):
+                url = futures[future]
+                try:
+                    text, status = future.result()
+                except DeadlineExceeded:
+                    continue
+                except Exception as e:
+                    text, status = '', f'error: {type(e).__name__}'
+                fetched[url] = (truncate_to_tokens(text, token_budget), status)
+                counts['fetched' if text else 'failed'] += 1
+                get_metrics().inc('enrich_fetches_total', outcome=status.split(':')[0])
+        except (FuturesTimeoutError, DeadlineExceeded):
+            print(f"⏱️  Time budget exhausted: {len(to_fetch) - len(fetched)} article(s) skipped")
+        finally:
+            # Downloads in flight stop at their own wall-clock cap (within the deadline), so this wait is short
+            pool.shutdown(wait=True, cancel_futures=True)
+        cache.put_many(fetched)
+        results.update(fetched)
+    
+    for story in stories:
+        text = results.get(story.get('url') or '', ('', ''))[0]
+        if text:
+            story['text'] = text
+    return counts
+
+class InsightRollup:
+    """Incrementally maintained insight aggregates for reports and trend queries
+
+    Saved insights bump hourly and daily (theme, sentiment) counters and
+    land in a fixed-size ring buffer of recent rows, so reports and queries
+    like "top themes over the last 7 days" read a bounded number of rows
+    no matter how long the history grows. agent_insights.csv is backfilled
+    once on first open.
+    """
+
+    def __init__(self, db_path=None, ring_size=None, legacy_csv='agent_insights.csv'):
+        self.db_path = db_path or AGENT_DB
+        self.ring_size = ring_size or RECENT_INSIGHTS_SIZE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS insight_counts (
+                granularity TEXT NOT NULL,      -- 'hour' or 'day'
+                bucket TEXT NOT NULL,           -- '2025-07-18T10' or '2025-07-18'
+                dimension TEXT NOT NULL,        -- 'theme' or 'sentiment'
+                value TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (granularity, dimension, bucket, value)
+            );
+            CREATE TABLE IF NOT EXISTS recent_insights (
+                slot INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                timestamp TEXT,
+                title TEXT,
+                theme TEXT,
+                sentiment TEXT,
+                insight TEXT
+            );
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+        """)
+        row = self._conn.execute("SELECT MAX(seq) FROM recent_insights").fetchone()
+        self._seq = (row[0] + 1) if row and row[0] is not None else 0
+        if legacy_csv:
+            self._backfill(legacy_csv)
+
+    def _backfill(self, path):
+        done = self._conn.execute("SELECT value FROM meta WHERE name = 'insights_backfilled'").fetchone()
+        if done:
             return
+        if Path(path).exists() and os.path.getsize(path) > 0:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    rows = [row for row in csv.DictReader(f) if row.get('theme')]
+                self.record(rows)
+                print(f"📥 Backfilled {len(rows)} insights from {path} into rollups")
+            except Exception as e:
+                print(f"⚠️  Could not backfill insight rollups from {path}: {e}")
+                return
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('insights_backfilled', ?)", (path,))
+
+    def record(self, insights):
+        """Fold saved insight records into the counters and the recent ring"""
+        increments = collections.Counter()
+        ring_rows = []
+        for insight in insights:
+            timestamp = insight.get('timestamp') or datetime.datetime.now().isoformat()
+            theme = (insight.get('theme') or 'Unknown').strip()
+            sentiment = (insight.get('sentiment') or 'neutral').strip().lower()
+            for granularity, bucket in (('hour', timestamp[:13]), ('day', timestamp[:10])):
+                increments[(granularity, 'theme', bucket, theme)] += 1
+                increments[(granularity, 'sentiment', bucket, sentiment)] += 1
+            ring_rows.append((timestamp, insight.get('title', ''), theme, sentiment, insight.get('insight', '')))
+        with self._lock, self._conn:
+            self._conn.executemany("""
+                INSERT INTO insight_counts VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (granularity, dimension, bucket, value) DO UPDATE SET count = count + excluded.count
+            """, [(g, b, d, v, n) for (g, d, b, v), n in increments.items()])
+            # Only the newest ring_size rows can survive, so skip writing older ones
+            skip = max(0, len(ring_rows) - self.ring_size)
+            self._seq += skip
+            for row in ring_rows[skip:]:
+                self._conn.execute("INSERT OR REPLACE INTO recent_insights VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   (self._seq % self.ring_size, self._seq, *row))
+                self._seq += 1
+
+    def recent(self, limit=10):
+        """Newest insights first, from the ring buffer"""
+        rows = self._conn.execute("""
+            SELECT timestamp, title, theme, sentiment, insight FROM recent_insights
+            ORDER BY seq DESC LIMIT ?""", (min(limit, self.ring_size),)).fetchall()
+        return [dict(zip(('timestamp', 'title', 'theme', 'sentiment', 'insight'), row)) for row in rows]
+
+    def counts(self, dimension, days=1, granularity='day'):
+        """{value: count} for 'theme' or 'sentiment' over the trailing window"""
+        now = datetime.datetime.now()
+        if granularity == 'hour':
+            since = (now - datetime.timedelta(days=days)).isoformat()[:13]
+        else:
+            since = (now - datetime.timedelta(days=days - 1)).date().isoformat()
+        rows = self._conn.execute("""
+            SELECT value, SUM(count) FROM insight_counts
+            WHERE granularity = ? AND dimension = ? AND bucket >= ?
+            GROUP BY value ORDER BY SUM(count) DESC""", (granularity, dimension, since)).fetchall()
+        return dict(rows)
+
+    def top_themes(self, days=7, limit=5):
+        """[(theme, count), ...] most frequent over the last `days` days"""
+        return list(self.counts('theme', days).items())[:limit]
+
+def get_insight_rollup():
+    """Return the process-wide insight rollup store"""
+    global _insight_rollup
+    if _insight_rollup is None:
+        _insight_rollup = InsightRollup()
+    return _insight_rollup
+
+POSITIVE_WORDS = {'launch', 'launches', 'launched', 'release', 'released', 'releases', 'breakthrough', 'raises',
+                  'raised', 'funding', 'record', 'wins', 'win', 'growth', 'faster', 'improves', 'improved', 'beats',
+                  'success', 'boost', 'surge', 'surges', 'open-source', 'opens', 'partnership', 'acquires', 'best'}
+NEGATIVE_WORDS = {'breach', 'breached', 'vulnerability', 'vulnerabilities', 'layoffs', 'lawsuit', 'sues', 'sued',
+                  'ban', 'banned', 'fails', 'failed', 'failure', 'outage', 'attack', 'attacks', 'hacked', 'exploit',
+                  'decline', 'shutdown', 'shuts', 'fined', 'warning', 'warns', 'crash', 'leak', 'leaked', 'scam',
+                  'fraud', 'risk', 'risks', 'concerns', 'cuts', 'slows', 'dead', 'dies', 'bankrupt', 'malware'}
+
+def story_sentiment(story):
+    """'positive' or 'negative' from word lists over title and excerpt, or None when undecided"""
+    words = re.findall(r"[a-z][a-z-]*", f"{story.get('title', '')} {story.get('text', '')}".lower())
+    score = sum(word in POSITIVE_WORDS for word in words) - sum(word in NEGATIVE_WORDS for word in words)
+    return 'positive' if score > 0 else 'negative' if score < 0 else None
+
+def provisional_theme(stories):
+    """A two-word name from the most common title words, until the LLM names the theme"""
+    words = collections.Counter(word for story in stories for word in re.findall(r"[A-Za-z][\w+#.-]*", story.get('title', ''))
+                                if len(word) > 2 and word.lower() not in TITLE_STOPWORDS)
+    return " ".join(word.title() if word.islower() else word for word, _ in words.most_common(2)) or 'Mixed Topics'
+
+class ThemeEngine:
+    """Local theme detection: hashed TF-IDF vectors clustered with mini-batch updates
+
+    Title words (weighted up) and article excerpts are hashed into a fixed
+    number of features and weighted by document frequencies that grow with
+    every batch. A story joins the most similar theme centroid when the
+    cosine similarity reaches the threshold, otherwise it starts a new
+    theme; centroids move towards their new members by the mini-batch
+    k-means rule. Only new themes need a name, so the LLM is asked once per
+    topic rather than once per story. Centroids, sizes and names persist in
+    the profile's state DB; past max_clusters the least recently seen
+    themes are dropped.
+    """
+
+    def __init__(self, db_path=None, features=None, similarity=None, max_clusters=None):
+        import numpy as np  # ImportError here means "use the LLM for themes"
+        self.db_path = db_path or AGENT_DB
+        self.features = features or THEME_FEATURES
+        self.similarity = THEME_SIMILARITY if similarity is None else similarity
+        self.max_clusters = max_clusters or THEME_MAX_CLUSTERS
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS theme_clusters (
+                cluster_id INTEGER PRIMARY KEY,
+                label TEXT NOT NULL,
+                labeled INTEGER NOT NULL,       -- 1 once named by the LLM
+                sentiment TEXT,
+                insight TEXT,
+                size INTEGER NOT NULL,
+                created TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                centroid BLOB NOT NULL          -- float32[features], unit length
+            );
+            CREATE TABLE IF NOT EXISTS theme_vocabulary (
+                features INTEGER PRIMARY KEY,
+                documents INTEGER NOT NULL,
+                df BLOB NOT NULL                -- float64[features] document frequencies
+            );
+        """)
+        row = self._conn.execute("SELECT documents, df FROM theme_vocabulary WHERE features = ?",
+                                 (self.features,)).fetchone()
+        self._documents = row[0] if row else 0
+        self._df = np.frombuffer(row[1], dtype=np.float64).copy() if row else np.zeros(self.features)
+        
+        # Centroids from a different feature size cannot be compared; start those themes over
+        with self._conn:
+            self._conn.execute("DELETE FROM theme_clusters WHERE length(centroid) != ?", (self.features * 4,))
+        self.clusters, self._ids, centroids = {}, [], []
+        for cluster_id, label, labeled, sentiment, insight, size, created, last_seen, centroid in self._conn.execute(
+                "SELECT * FROM theme_clusters ORDER BY cluster_id"):
+            self.clusters[cluster_id] = {'label': label, 'labeled': bool(labeled), 'sentiment': sentiment,
+                                         'insight': insight, 'size': size, 'created': created, 'last_seen': last_seen}
+            self._ids.append(cluster_id)
+            centroids.append(np.frombuffer(centroid, dtype=np.float32))
+        self._centroids = np.array(centroids, dtype=np.float32).reshape(len(centroids), self.features)
+        self._next_id = max(self._ids, default=0) + 1
+
+    def __len__(self):
+        return len(self._ids)
+
+    def vectorize(self, stories, update=True):
+        """Unit-length TF-IDF rows for the stories; update=True counts them into the document frequencies"""
+        import numpy as np
+        counts = np.zeros((len(stories), self.features), dtype=np.float32)
+        for row, story in enumerate(stories):
+            for weight, text in ((3, story.get('title')), (1, story.get('text'))):
+                for word in content_words(text):
+                    counts[row, zlib.crc32(word.encode('utf-8')) % self.features] += weight
+        present = counts > 0
+        if update:
+            self._df += present.sum(axis=0)
+            self._documents += len(stories)
+        vectors = np.zeros_like(counts)
+        vectors[present] = 1 + np.log(counts[present])
+        vectors *= (np.log((1 + self._documents) / (1 + self._df)) + 1).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    def assign(self, stories):
+        """Put each story into a theme; returns ({story id: cluster id or None}, [new cluster ids])
+
+        Stories without any content words get None.
+        """
+        import numpy as np
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            vectors = self.vectorize(stories)
+            similarities = vectors @ self._centroids.T
+            assignments, members, new_ids, seeds = {}, collections.defaultdict(list), [], []
+            for row, story in enumerate(stories):
+                if not vectors[row].any():
+                    assignments[str(story['id'])] = None
+                    continue
+                best, score = None, self.similarity
+                if len(self._ids):
+                    column = int(similarities[row].argmax())
+                    if similarities[row, column] >= score:
+                        best, score = self._ids[column], similarities[row, column]
+                if seeds:
+                    # Themes started earlier in this batch compete with the stored ones
+                    seed_scores = np.array(seeds) @ vectors[row]
+                    column = int(seed_scores.argmax())
+                    if seed_scores[column] >= score:
+                        best = new_ids[column]
+                if best is None:
+                    best = self._next_id
+                    self._next_id += 1
+                    new_ids.append(best)
+                    seeds.append(vectors[row])
+                members[best].append(row)
+                assignments[str(story['id'])] = best
             
-        story_data = {
-            'title': title.strip(),
-            'first_seen': datetime.datetime.now().isoformat()
-        }
-        save_to_csv(story_data, 'seen_stories.csv')
+            # Mini-batch k-means: move each centroid towards its new members' mean
+            rows = {cluster_id: row for row, cluster_id in enumerate(self._ids)}
+            for cluster_id, member_rows in members.items():
+                mean = vectors[member_rows].mean(axis=0)
+                if cluster_id in rows:
+                    info = self.clusters[cluster_id]
+                    info['size'] += len(member_rows)
+                    info['last_seen'] = now
+                    rate = len(member_rows) / info['size']
+                    centroid = (1 - rate) * self._centroids[rows[cluster_id]] + rate * mean
+                    self._centroids[rows[cluster_id]] = centroid / (np.linalg.norm(centroid) or 1)
+                else:
+                    seeds[new_ids.index(cluster_id)] = mean / (np.linalg.norm(mean) or 1)
+                    self.clusters[cluster_id] = {'label': provisional_theme([stories[row] for row in member_rows]),
+                                                 'labeled': False, 'sentiment': None, 'insight': None,
+                                                 'size': len(member_rows), 'created': now, 'last_seen': now}
+            if new_ids:
+                self._centroids = np.vstack([self._centroids, np.array(seeds, dtype=np.float32)])
+                self._ids.extend(new_ids)
+            evicted = self._evict(keep=set(members))
+            self._save(set(members) - evicted, evicted)
+        metrics = get_metrics()
+        metrics.inc('themes_assigned_total', sum(len(rows) for rows in members.values()) - len(new_ids), outcome='existing')
+        metrics.inc('themes_assigned_total', len(new_ids), outcome='new')
+        return assignments, new_ids
+
+    def _evict(self, keep):
+        """Drop the least recently seen themes beyond max_clusters (never ones just updated)"""
+        import numpy as np
+        excess = len(self._ids) - self.max_clusters
+        if excess <= 0:
+            return set()
+        candidates = sorted((self.clusters[cluster_id]['last_seen'], cluster_id) for cluster_id in self._ids
+                            if cluster_id not in keep)
+        evicted = {cluster_id for _, cluster_id in candidates[:excess]}
+        keep_rows = [row for row, cluster_id in enumerate(self._ids) if cluster_id not in evicted]
+        self._centroids = self._centroids[keep_rows]
+        self._ids = [self._ids[row] for row in keep_rows]
+        for cluster_id in evicted:
+            del self.clusters[cluster_id]
+        return evicted
+
+    def _save(self, changed, evicted):
+        rows = {cluster_id: row for row, cluster_id in enumerate(self._ids)}
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO theme_clusters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+                (cluster_id, info['label'], int(info['labeled']), info['sentiment'], info['insight'], info['size'],
+                 info['created'], info['last_seen'], self._centroids[rows[cluster_id]].tobytes())
+                for cluster_id, info in ((cluster_id, self.clusters[cluster_id]) for cluster_id in changed)])
+            self._conn.executemany("DELETE FROM theme_clusters WHERE cluster_id = ?", [(c,) for c in evicted])
+            self._conn.execute("INSERT OR REPLACE INTO theme_vocabulary VALUES (?, ?, ?)",
+                               (self.features, self._documents, self._df.tobytes()))
+
+    def unlabeled(self, cluster_ids):
+        """The given themes that still carry a provisional name"""
+        with self._lock:
+            return sorted(cluster_id for cluster_id in cluster_ids
+                          if cluster_id in self.clusters and not self.clusters[cluster_id]['labeled'])
+
+    def set_labels(self, labels):
+        """Store LLM names: {cluster id: {'theme', 'sentiment', 'insight'}}"""
+        with self._lock, self._conn:
+            for cluster_id, result in labels.items():
+                info = self.clusters.get(int(cluster_id))
+                if info is None:
+                    continue
+                info.update(label=result['theme'], labeled=True, sentiment=result['sentiment'], insight=result['insight'])
+                self._conn.execute("UPDATE theme_clusters SET label = ?, labeled = 1, sentiment = ?, insight = ? "
+                                   "WHERE cluster_id = ?", (info['label'], info['sentiment'], info['insight'], int(cluster_id)))
+
+    def theme(self, cluster_id):
+        """A copy of one theme's name, sentiment, insight and size, or None"""
+        with self._lock:
+            info = self.clusters.get(cluster_id)
+            return dict(info) if info else None
+
+    def new_themes(self, since):
+        """Names of themes first seen at or after the ISO timestamp `since`, largest first"""
+        with self._lock:
+            fresh = [info for info in self.clusters.values() if info['created'] >= since]
+        return list(dict.fromkeys(info['label'] for info in sorted(fresh, key=lambda info: -info['size'])))
+
+def build_theme_engine(db_path=None):
+    """A ThemeEngine, or False when THEME_ENGINE is 'llm' or NumPy is missing (themes then come from the LLM)"""
+    if THEME_ENGINE != 'local':
+        return False
+    try:
+        return ThemeEngine(db_path)
+    except ImportError:
+        print("⚠️  NumPy is not installed - using the LLM for themes (pip install numpy)")
+        return False
+
+def get_theme_engine():
+    """Return the process-wide theme engine, or None when themes come from the LLM"""
+    global _theme_engine
+    if _theme_engine is None:
+        _theme_engine = build_theme_engine()
+    return _theme_engine if _theme_engine is not False else None
+
+def summarize_themes(rollup, engine=None):
+    """Deterministic daily summary from the rollups: top theme, fastest riser, mood and new themes"""
+    today = rollup.counts('theme', days=1)
+    week = rollup.counts('theme', days=7)
+    sentiments = rollup.counts('sentiment', days=1)
+    top, top_count = next(iter(today.items()))
+    
+    def lift(theme):
+        # Today's count against the daily average of the previous six days
+        return today[theme] / max(1.0, (week.get(theme, 0) - today[theme]) / 6)
+    
+    rising = max((theme for theme, count in today.items() if count >= 2 and theme != top), key=lift, default=None)
+    mood, mood_count = max(sentiments.items(), key=lambda item: item[1])
+    parts = [f"Key trend: {top} ({top_count} stories)",
+             f"Overall sentiment: {mood} ({100 * mood_count // max(1, sum(sentiments.values()))}%)"]
+    if rising:
+        parts.append(f"Rising: {rising} ({lift(rising):.1f}x its daily average)")
+    new = engine.new_themes(datetime.date.today().isoformat()) if engine else []
+    if new:
+        parts.append(f"New: {', '.join(new[:3])}")
+    return ". ".join(parts) + "."
+
+class WorkQueue:
+    """Durable SQLite queue of stories awaiting analysis, with leases and acknowledgements
+
+    Collection enqueues new stories; analysis workers lease a batch and
+    ack() it only after the insights are saved, so a crash anywhere in
+    between leaves the stories in the queue to be handed out again
+    (at-least-once). Failures are retried with exponential backoff and
+    parked as 'failed' after QUEUE_MAX_ATTEMPTS, including stories whose
+    lease keeps expiring because they take the worker down; release() hands
+    back stories that failed through no fault of their own (LLM outage or
+    budget) without using up an attempt, and requeue_failed() gives parked
+    stories a fresh start. One agent process owns a queue: leases left by a
+    previous run are released on open.
+    """
+
+    def __init__(self, db_path=None, lease_seconds=None, max_attempts=None):
+        self.db_path = db_path or AGENT_DB
+        self.lease_seconds = QUEUE_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.max_attempts = QUEUE_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self._lock = threading.Lock()
+        self._waiters = set()    # (loop, asyncio.Event) pairs of idle workers
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS work_queue (
+                job_id INTEGER PRIMARY KEY,
+                story_key TEXT UNIQUE NOT NULL,
+                story TEXT NOT NULL,            -- JSON story record
+                status TEXT NOT NULL,           -- pending | leased | done | failed
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,     -- pending: not before; leased: lease expiry
+                enqueued REAL NOT NULL,
+                updated REAL NOT NULL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_work_queue_status ON work_queue(status, available_at);
+        """)
+        with self._conn:
+            parked = self._park_expired(time.time(), "leased by a run that did not finish")
+            released = self._conn.execute("UPDATE work_queue SET status = 'pending', available_at = ? WHERE status = 'leased'",
+                                          (time.time(),)).rowcount
+        if released:
+            print(f"♻️  Re-queued {released} stories leased by a previous run")
+        if parked:
+            print(f"🅿️  Parked {parked} stories that were leased {self.max_attempts} times without finishing")
+
+    def _park_expired(self, now, error):
+        """Mark expired leases that have used up their attempts as failed; returns how many"""
+        return self._conn.execute("""
+            UPDATE work_queue SET status = 'failed', updated = ?, error = ?
+            WHERE status = 'leased' AND available_at <= ? AND attempts >= ?""",
+            (now, error, now, self.max_attempts)).rowcount
+
+    def enqueue(self, stories):
+        """Add stories (keyed by id) in one transaction; returns how many were new"""
+        now = time.time()
+        rows = [(str(story['id']), json.dumps(story, ensure_ascii=False), now, now, now) for story in stories]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("""
+                INSERT OR IGNORE INTO work_queue (story_key, story, status, available_at, enqueued, updated)
+                VALUES (?, ?, 'pending', ?, ?, ?)""", rows)
+            added = self._conn.total_changes - before
+        if added:
+            get_metrics().inc('queue_enqueued_total', added)
+            self.notify()
+        return added
+
+    def lease(self, limit):
+        """Lease up to `limit` available stories: [(job_id, story), ...] oldest first"""
+        now = time.time()
+        with self._lock, self._conn:
+            parked = self._park_expired(now, "lease expired on every attempt")
+            rows = self._conn.execute("""
+                SELECT job_id, story FROM work_queue
+                WHERE status IN ('pending', 'leased') AND available_at <= ?
+                ORDER BY job_id LIMIT ?""", (now, limit)).fetchall()
+            self._conn.executemany("""
+                UPDATE work_queue SET status = 'leased', attempts = attempts + 1, available_at = ?, updated = ?
+                WHERE job_id = ?""", [(now + self.lease_seconds, now, job_id) for job_id, _ in rows])
+        if parked:
+            get_metrics().inc('queue_parked_total', parked)
+        return [(job_id, json.loads(story)) for job_id, story in rows]
+
+    def ack(self, job_ids):
+        """Mark leased jobs done"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE work_queue SET status = 'done', updated = ?, error = NULL WHERE job_id = ?",
+                                   [(now, job_id) for job_id in job_ids])
+        get_metrics().inc('queue_acked_total', len(job_ids))
+
+    def nack(self, job_ids, error=''):
+        """Return leased jobs for a later retry, or park them as failed after max_attempts"""
+        now = time.time()
+        with self._lock, self._conn:
+            for job_id in job_ids:
+                row = self._conn.execute("SELECT attempts FROM work_queue WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    continue
+                if row[0] >= self.max_attempts:
+                    self._conn.execute("UPDATE work_queue SET status = 'failed', updated = ?, error = ? WHERE job_id = ?",
+                                       (now, str(error)[:500], job_id))
+                else:
+                    retry_at = now + QUEUE_RETRY_SECONDS * 2 ** (row[0] - 1)
+                    self._conn.execute("""
+                        UPDATE work_queue SET status = 'pending', available_at = ?, updated = ?, error = ?
+                        WHERE job_id = ?""", (retry_at, now, str(error)[:500], job_id))
+        get_metrics().inc('queue_nacked_total', len(job_ids))
+
+    def release(self, job_ids, error='', delay=None):
+        """Return leased jobs for a retry after `delay` seconds without counting the attempt"""
+        now = time.time()
+        retry_at = now + (QUEUE_RETRY_SECONDS if delay is None else delay)
+        with self._lock, self._conn:
+            self._conn.executemany("""
+                UPDATE work_queue SET status = 'pending', attempts = MAX(attempts - 1, 0), available_at = ?,
+                    updated = ?, error = ?
+                WHERE job_id = ? AND status = 'leased'""",
+                [(retry_at, now, str(error)[:500], job_id) for job_id in job_ids])
+        get_metrics().inc('queue_released_total', len(job_ids))
+
+    def requeue_failed(self):
+        """Give every parked job a fresh set of attempts; returns how many"""
+        now = time.time()
+        with self._lock, self._conn:
+            requeued = self._conn.execute("""
+                UPDATE work_queue SET status = 'pending', attempts = 0, available_at = ?, updated = ?
+                WHERE status = 'failed'""", (now, now)).rowcount
+        if requeued:
+            self.notify()
+        return requeued
+
+    def prune(self, older_than_seconds):
+        """Delete finished jobs older than the retention window; returns rows removed"""
+        cutoff = time.time() - older_than_seconds
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM work_queue WHERE status = 'done' AND updated < ?", (cutoff,)).rowcount
+
+    def stats(self):
+        """Jobs per status plus the age of the oldest unfinished one (the visible backlog)"""
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM work_queue GROUP BY status").fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(enqueued) FROM work_queue WHERE status IN ('pending', 'leased')").fetchone()[0]
+        stats = {status: counts.get(status, 0) for status in ('pending', 'leased', 'done', 'failed')}
+        stats['oldest_pending_s'] = round(time.time() - oldest, 1) if oldest else 0.0
+        return stats
+
+    def notify(self):
+        for loop, event in list(self._waiters):
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait_async(self, seconds):
+        """Sleep until something is enqueued (or notify() is called), at most `seconds`"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(waiter)
+
+def get_work_queue():
+    """Return the process-wide analysis work queue"""
+    global _work_queue
+    if _work_queue is None:
+        _work_queue = WorkQueue()
+    return _work_queue
+
+class StateStore:
+    """Small JSON key/value table for state that should outlive the process
+
+    Holds the scheduler rates and the HN collector's poll state, so a
+    restarted agent, or a one-shot run from cron, picks up warm.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or AGENT_DB
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS agent_state (name TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL)")
+
+    def get(self, name, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM agent_state WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def put(self, name, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO agent_state VALUES (?, ?, ?)",
+                               (name, json.dumps(value, ensure_ascii=False), time.time()))
+
+def get_state_store():
+    """Return the process-wide persistent state store"""
+    global _state_store
+    if _state_store is None:
+        _state_store = StateStore()
+    return _state_store
+
+def save_agent_state(profile, scheduler):
+    """Persist the profile's scheduler and the shared HN collector for the next start"""
+    try:
+        store = get_state_store()
+        store.put(f"scheduler:{profile.name}", scheduler.state())
+        if _hn_collector is not None:
+            store.put('hn_collector', _hn_collector.state())
     except Exception as e:
-        print(f"⚠️  Could not save seen story: {e}")
+        print(f"⚠️  Could not persist agent state: {e}")
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) for budget packing"""
+    return len(text) // 4 + 1
+
+def format_story_line(story):
+    """One compact JSON line describing a story (and its article excerpt) for the analysis prompt"""
+    line = {'id': story['id'], 'title': story['title'], 'score': story.get('score', 0)}
+    if story.get('text'):
+        line['excerpt'] = story['text']
+    return json.dumps(line, ensure_ascii=False)
+
+def pack_story_batches(stories, token_budget=None, overhead_tokens=None):
+    """Greedily pack stories into batches whose prompts fit the token budget
+
+    A story that alone exceeds the budget still gets its own batch.
+    """
+    token_budget = token_budget or ANALYSIS_TOKEN_BUDGET
+    overhead_tokens = estimate_tokens(ANALYSIS_PROMPT) if overhead_tokens is None else overhead_tokens
+    batches, current, used = [], [], overhead_tokens
+    for story in stories:
+        cost = estimate_tokens(format_story_line(story))
+        if current and (used + cost > token_budget or len(current) >= ANALYSIS_MAX_BATCH):
+            batches.append(current)
+            current, used = [], overhead_tokens
+        current.append(story)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_analysis_lines(response, stories):
+    """Parse JSON-lines analysis output into {story_id: result}, ignoring junk lines"""
+    known = {str(story['id']): story for story in stories}
+    results = {}
+    for line in response.splitlines():
+        line = line.strip().strip(',')
+        if not line.startswith('{'):
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        story_id = str(item.get('id', ''))
+        if story_id not in known:
+            continue
+        sentiment = str(item.get('sentiment', 'neutral')).strip().lower()
+        if sentiment not in ['positive', 'negative', 'neutral']:
+            sentiment = 'neutral'
+        results[story_id] = {
+            'theme': str(item.get('theme', '')).strip() or 'Mixed Topics',
+            'sentiment': sentiment,
+            'insight': str(item.get('insight', '')).strip()[:300] or 'No insight available'
+        }
+    return results
+
+class CycleScheduler:
+    """Adaptive, interruptible poll scheduler
+
+    The next interval shrinks when recent cycles found many new stories and
+    grows toward the maximum when the feed is quiet, always within
+    [POLL_MIN_SECONDS, POLL_MAX_SECONDS]. Consecutive failures back off
+    exponentially from ERROR_BACKOFF_SECONDS. Waits block on an event, so
+    stop() (SIGTERM/SIGINT) and wake() (SIGHUP reload) take effect at once.
+    Bounds not given (None) follow the POLL_* settings as they are reloaded.
+    """
+
+    def __init__(self, min_interval=None, max_interval=None, base_interval=None, smoothing=0.3):
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._base_interval = base_interval
+        self.smoothing = smoothing
+        self.new_story_rate = POLL_TARGET_NEW_STORIES   # EWMA of new stories per cycle
+        self.error_rate = 0.0                           # EWMA of failed cycles
+        self.consecutive_errors = 0
+        self.next_due = 0.0                             # epoch seconds when the next cycle should run
+        self.history = collections.deque(maxlen=50)     # recent cycle timestamps and outcomes
+        self.stopping = False
+        self.reload_requested = False
+        self._wake = threading.Event()
+        self._async_waiters = set()   # (loop, asyncio.Event) pairs blocked in wait_async()
+
+    def record_cycle(self, started, new_stories=0, error=False):
+        """Fold one cycle's outcome into the rates and return the next interval"""
+        alpha = self.smoothing
+        self.new_story_rate = (1 - alpha) * self.new_story_rate + alpha * new_stories
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * (1.0 if error else 0.0)
+        self.consecutive_errors = self.consecutive_errors + 1 if error else 0
+        interval = self.next_interval()
+        self.next_due = time.time() + interval
+        self.history.append({
+            'started': started.isoformat(),
+            'finished': datetime.datetime.now().isoformat(),
+            'new_stories': new_stories,
+            'error': error,
+            'next_interval': round(interval, 1)
+        })
+        return interval
+
+    def state(self):
+        """JSON-serializable rates and due time (see restore)"""
+        return {'new_story_rate': self.new_story_rate, 'error_rate': self.error_rate,
+                'consecutive_errors': self.consecutive_errors, 'next_due': self.next_due,
+                'history': list(self.history)[-10:]}
+
+    def restore(self, state):
+        if not state:
+            return self
+        self.new_story_rate = state.get('new_story_rate', self.new_story_rate)
+        self.error_rate = state.get('error_rate', self.error_rate)
+        self.consecutive_errors = state.get('consecutive_errors', self.consecutive_errors)
+        self.next_due = state.get('next_due', self.next_due)
+        self.history.extend(state.get('history', []))
+        return self
+
+    @property
+    def min_interval(self):
+        return self._min_interval or POLL_MIN_SECONDS
+
+    @property
+    def max_interval(self):
+        return self._max_interval or POLL_MAX_SECONDS
+
+    @property
+    def base_interval(self):
+        return self._base_interval or POLL_BASE_SECONDS
+
+    def next_interval(self):
+        if self.consecutive_errors:
+            backoff = ERROR_BACKOFF_SECONDS * 2 ** (self.consecutive_errors - 1)
+            return min(self.max_interval, backoff)
+        busyness = max(self.new_story_rate, 0.01) / POLL_TARGET_NEW_STORIES
+        interval = self.base_interval / busyness * (1 + self.error_rate)
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def wait(self, seconds):
+        """Sleep up to `seconds`; returns True if woken early by stop() or wake()"""
+        woken = self._wake.wait(seconds)
+        self._wake.clear()
+        return woken
+
+    async def wait_async(self, seconds):
+        """wait() without tying up a worker thread, so many profiles can share one event loop"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._async_waiters.add(waiter)
+        try:
+            if not self._wake.is_set():
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._async_waiters.discard(waiter)
+        woken = self._wake.is_set()
+        self._wake.clear()
+        return woken
+
+    def _notify(self):
+        self._wake.set()
+        for loop, event in list(self._async_waiters):
+            loop.call_soon_threadsafe(event.set)
+
+    def wake(self, reload=False):
+        self.reload_requested = self.reload_requested or reload
+        self._notify()
+
+    def stop(self):
+        self.stopping = True
+        self._notify()
+
+def load_agent_config(path=None):
+    """Read the optional JSON config file ({} when absent)"""
+    path = path or AGENT_CONFIG_FILE
+    if not Path(path).exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_config_overrides(path=None):
+    """Apply {"SETTING": value} overrides from the JSON config file to module settings
+
+    All values are converted before any is applied, so a bad file or value
+    raises and leaves every setting as it was.
+    """
+    config = load_agent_config(path)
+    settings = globals()
+    applied = {}
+    for name, value in config.get('settings', {}).items():
+        if name.isupper() and name in settings and not callable(settings[name]):
+            if isinstance(settings[name], bool):
+                value = str(value).lower() in ('1', 'true', 'yes')
+            applied[name] = type(settings[name])(value)
+    settings.update(applied)
+    # Drop singletons built from settings so they pick up the new values
+    global _relevance_matcher, _sources
+    _relevance_matcher = None
+    _sources = None
+    return applied
+
+class Profile:
+    """One monitoring profile: keywords, prompts, output files, schedule and dedup state
+
+    Profiles in one process share the HN collector's item cache, the HTTP
+    pool, the sources and the LLM cache, so fetch load grows with unique
+    items rather than with the number of profiles. Matching, seen stores,
+    rollups and output files are per profile. A profile without a directory
+    is the default one: module settings and the original file layout.
+    """
+
+    def __init__(self, name='default', directory=None, keywords=None, threshold=None,
+                 analysis_prompt=None, report_prompt=None, label_prompt=None, schedule=None, sources=None):
+        self.name = name
+        self.directory = Path(directory) if directory else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.keywords = keywords          # 'kw[:weight], ...', a list, or a {keyword: weight} dict
+        self.threshold = threshold
+        self.analysis_prompt = analysis_prompt or ANALYSIS_PROMPT
+        self.report_prompt = report_prompt or REPORT_PROMPT
+        self.label_prompt = label_prompt or THEME_LABEL_PROMPT  # names new themes of the local engine
+        self.schedule = schedule or {}    # min/max/base seconds for this profile's CycleScheduler
+        self.source_specs = sources
+        self._matcher = self._sources = self._seen_store = self._near_dup_index = None
+        self._rollup = self._storage = self._queue = self._theme_engine = None
+
+    @property
+    def is_default(self):
+        return self.directory is None
+
+    def path(self, filename):
+        return str(self.directory / filename) if self.directory else filename
+
+    @property
+    def db_path(self):
+        return self.path('agent_state.db') if self.directory else AGENT_DB
+
+    @property
+    def matcher(self):
+        if self.keywords is None:
+            return get_relevance_matcher()
+        if self._matcher is None:
+            keywords = self.keywords
+            if isinstance(keywords, str):
+                keywords = parse_keywords(keywords)
+            elif not isinstance(keywords, dict):
+                keywords = {keyword: 1.0 for keyword in keywords}
+            self._matcher = RelevanceMatcher(keywords, RELEVANCE_THRESHOLD if self.threshold is None else self.threshold)
+        return self._matcher
+
+    @property
+    def sources(self):
+        if self.source_specs is None:
+            return get_sources()
+        if self._sources is None:
+            self._sources = build_sources(self.source_specs)
+        return self._sources
+
+    @property
+    def seen_store(self):
+        if self.is_default:
+            return get_seen_store()
+        if self._seen_store is None:
+            self._seen_store = SeenStoryStore(self.db_path, legacy_csv=self.path('seen_stories.csv'))
+        return self._seen_store
+
+    @property
+    def near_dup_index(self):
+        if self.is_default:
+            return get_near_dup_index()
+        if self._near_dup_index is None:
+            self._near_dup_index = build_near_dup_index(self.seen_store)
+        return self._near_dup_index
+
+    @property
+    def rollup(self):
+        if self.is_default:
+            return get_insight_rollup()
+        if self._rollup is None:
+            self._rollup = InsightRollup(self.db_path, legacy_csv=self.path('agent_insights.csv'))
+        return self._rollup
+
+    @property
+    def theme_engine(self):
+        """This profile's local theme engine, or None when themes come from the LLM
+
+        A profile with its own analysis prompt gets per-story LLM analysis,
+        since the local engine would never use that prompt.
+        """
+        if self.analysis_prompt != ANALYSIS_PROMPT:
+            return None
+        if self.is_default:
+            return get_theme_engine()
+        if self._theme_engine is None:
+            self._theme_engine = build_theme_engine(self.db_path)
+        return self._theme_engine if self._theme_engine is not False else None
+
+    @property
+    def queue(self):
+        if self.is_default:
+            return get_work_queue()
+        if self._queue is None:
+            self._queue = WorkQueue(self.db_path)
+        return self._queue
+
+    @property
+    def storage(self):
+        if self.is_default:
+            return get_storage()
+        if self._storage is None:
+            self._storage = SQLiteBackend(self.db_path) if STORAGE_BACKEND == 'sqlite' else CSVBackend(self.directory)
+            atexit.register(self._storage.close)
+        return self._storage
+
+    def scheduler(self):
+        """A CycleScheduler using this profile's interval bounds, resumed from its saved state"""
+        scheduler = CycleScheduler(min_interval=self.schedule.get('min_seconds'),
+                                   max_interval=self.schedule.get('max_seconds'),
+                                   base_interval=self.schedule.get('base_seconds'))
+        try:
+            scheduler.restore(get_state_store().get(f"scheduler:{self.name}"))
+        except Exception as e:
+            print(f"⚠️  Could not restore scheduler state for {self.name}: {e}")
+        return scheduler
+
+def load_profiles(path=None):
+    """Profiles from the config file's "profiles" list, else just the default profile
+
+    Each entry is {"name": ..., "keywords": ..., "threshold": ..., "analysis_prompt": ...,
+    "report_prompt": ..., "label_prompt": ..., "schedule": {"min_seconds": ...}, "sources": [...], "directory": ...};
+    outputs go to `directory` (default: the profile name).
+    """
+    specs = load_agent_config(path).get('profiles') or []
+    profiles, directories = [], set()
+    for spec in specs:
+        spec = dict(spec)
+        name = spec.get('name')
+        if not name:
+            raise ValueError(f"Profile without a name: {spec}")
+        spec.setdefault('directory', name)
+        if spec['directory'] in directories:
+            raise ValueError(f"Profiles must not share an output directory: {spec['directory']}")
+        directories.add(spec['directory'])
+        profiles.append(Profile(**spec))
+    return profiles or [Profile()]
 
 # Agent Nodes
-class DataCollectionNode(Node):
+class DataCollectionNode(AsyncNode):
     """Collect recent tech news data"""
     
-    def prep(self, shared):
+    async def prep_async(self, shared):
         print(f"[{datetime.datetime.now()}] Starting data collection...")
+        profile = shared.setdefault('profile', Profile())
         try:
-            seen_stories = load_seen_stories()
-            shared['seen_stories'] = seen_stories
-            print(f"📚 Loaded {len(seen_stories)} previously seen stories")
-            return None
+            seen_store = shared.get('seen_store') or profile.seen_store
+            shared['seen_store'] = seen_store
+            if NEAR_DUP_THRESHOLD < 1 and 'near_dup_index' not in shared:
+                shared['near_dup_index'] = profile.near_dup_index
+            if SEEN_TTL_DAYS > 0:
+                expired = seen_store.expire_older_than(SEEN_TTL_DAYS * 86400)
+                if shared.get('near_dup_index') is not None:
+                    shared['near_dup_index'].expire_older_than(SEEN_TTL_DAYS * 86400)
+                if expired:
+                    print(f"🧹 Expired {expired} seen stories older than {SEEN_TTL_DAYS} days")
+            print(f"📚 {len(seen_store)} previously seen stories in index")
+            if QUEUE_RETAIN_DAYS > 0:
+                profile.queue.prune(QUEUE_RETAIN_DAYS * 86400)
         except Exception as e:
-            print(f"⚠️  Error loading seen stories: {e}")
-            shared['seen_stories'] = set()
-            return None
+            print(f"⚠️  Error opening seen story store: {e}")
+            shared['seen_store'] = None
+        return profile
     
-    def exec(self, prep_res):
-        try:
-            stories = get_hackernews_stories()
-            return stories
-        except Exception as e:
-            print(f"❌ Data collection failed: {e}")
-            return []
+    async def exec_async(self, profile):
+        # Sources fan out concurrently, each off the event loop with its own timeout
+        sources = getattr(self, 'sources', None) or profile.sources
+        stories, failed = await collect_from_sources(sources, profile.matcher)
+        if failed and len(failed) == len(sources):
+            raise RuntimeError(f"all sources failed: {', '.join(failed)}")
+        return stories
     
-    def exec_fallback(self, prep_res, exc):
+    async def exec_fallback_async(self, prep_res, exc):
         print(f"❌ Data collection fallback triggered: {exc}")
-        return []
+        return None
     
-    def post(self, shared, prep_res, exec_res):
+    async def post_async(self, shared, prep_res, exec_res):
+        shared['collection_failed'] = exec_res is None
+        shared['new_story_count'] = 0
+        exec_res = exec_res or []
         try:
-            seen_stories = shared.get('seen_stories', set())
-            new_stories = []
+            seen_store = shared.get('seen_store')
+            near_index = shared.get('near_dup_index')
+            # Stories only enter the persistent index once queued; this batch is checked against itself here
+            batch_index = NearDuplicateIndex(threshold=near_index.threshold) if near_index is not None else None
+            new_stories, prepared = [], []
+            batch_keys = set()
             
             print(f"🔍 Processing {len(exec_res)} stories...")
             
-            # Filter out stories we've already seen
+            # Filter out stories we've already seen (or repeated within this batch)
             for story in exec_res:
                 title = story['title'].strip()
-                if title not in seen_stories:
-                    new_stories.append(story)
-                    # Mark story as seen and save it
-                    save_seen_story(title)
-                    seen_stories.add(title)
-                    print(f"✨ New story: {title[:50]}...")
-                else:
+                keys = {normalize_title(title), (story.get('url') or '').strip()} - {''}
+                if keys & batch_keys or (seen_store is not None and seen_store.contains(story)):
                     print(f"🔄 Skipping seen story: {title[:50]}...")
+                    continue
+                match = None
+                if near_index is not None:
+                    signature = near_index.prepare(story)
+                    match = near_index.find(story, signature) or batch_index.find(story, signature)
+                if match:
+                    print(f"🪞 Skipping near-duplicate ({match[1]:.2f}) of: {match[0][:50]}...")
+                    get_metrics().inc('near_duplicates_total')
+                    continue
+                batch_keys |= keys
+                if near_index is not None:
+                    batch_index.add(story, signature)
+                    prepared.append(signature)
+                new_stories.append(story)
+                print(f"✨ New story: {title[:50]}...")
+            
+            # Queue new stories for analysis before marking them seen, so a crash
+            # in between re-collects them instead of losing them
+            if new_stories:
+                queued = prep_res.queue.enqueue(new_stories)
+                print(f"📥 Queued {queued} stories for analysis ({prep_res.queue.stats()['pending']} pending)")
+                if near_index is not None:
+                    near_index.add_many(new_stories, prepared)
+            if seen_store is not None and new_stories:
+                seen_store.add_many(new_stories)
+            if new_stories:
+                first_seen = datetime.datetime.now().isoformat()
+                save_to_csv([{'title': story['title'].strip(), 'url': story.get('url', ''), 'first_seen': first_seen}
+                             for story in new_stories], 'seen_stories.csv', prep_res.storage)
             
-            shared['raw_stories'] = new_stories
+            shared['new_story_count'] = len(new_stories)
             shared['collection_time'] = datetime.datetime.now().isoformat()
             
             if new_stories:
                 print(f"✅ Found {len(new_stories)} new stories (filtered {len(exec_res) - len(new_stories)} duplicates)")
-                return "analyze"
             else:
                 print(f"📰 No new stories found (all {len(exec_res)} were duplicates or no stories available)")
-                return "wait"
+            return "wait"
                 
         except Exception as e:
             print(f"❌ Error in data collection post-processing: {e}")
             return "wait"
 
-class AnalysisNode(Node):
-    """Analyze collected stories using LLM"""
+class EnrichmentNode(AsyncNode):
+    """Attach article excerpts to leased stories before analysis (best effort)"""
+    
+    async def prep_async(self, shared):
+        return shared.get('raw_stories', [])
+    
+    async def exec_async(self, stories):
+        if not stories or ENRICH_TOKEN_BUDGET <= 0:
+            return None
+        return await asyncio.to_thread(enrich_stories, stories)
+    
+    async def exec_fallback_async(self, stories, exc):
+        print(f"⚠️  Enrichment skipped: {exc}")
+        return None
+    
+    async def post_async(self, shared, prep_res, exec_res):
+        if exec_res:
+            print(f"📄 Article excerpts: {exec_res['cached']} cached, {exec_res['fetched']} fetched, "
+                  f"{exec_res['failed']} unavailable")
+        return "default"
+
+class AnalysisNode(AsyncParallelBatchNode):
+    """Analyze collected stories using LLM, packing as many as fit per request
+
+    Each batch is one item of the parallel batch, so batches are analyzed
+    concurrently (bounded by ANALYSIS_CONCURRENCY) and retry/fall back
+    independently. With a local theme engine, stories are clustered into
+    themes locally and the LLM only names new themes.
+    """
     
-    def prep(self, shared):
+    async def prep_async(self, shared):
+        self._unavailable = set()  # ids of stories whose batch failed because the LLM was unavailable
         stories = shared.get('raw_stories', [])
         if not stories:
             return None
         
-        # Create a concise summary of stories for analysis
-        story_summary = "\n".join([f"- {story['title']} (Score: {story['score']})" 
-                                  for story in stories[:3]])
-        print(f"🧠 Analyzing {len(stories)} stories...")
-        return story_summary
+        profile = shared.setdefault('profile', Profile())
+        self._engine = profile.theme_engine
+        self._slots = asyncio.Semaphore(ANALYSIS_CONCURRENCY)
+        self._label_prompt = profile.label_prompt
+        if self._engine is not None:
+            print(f"🧠 Assigning themes to {len(stories)} stories locally ({len(self._engine)} known themes)...")
+            return [stories]
+        
+        self._prompt = profile.analysis_prompt
+        batches = pack_story_batches(stories, overhead_tokens=estimate_tokens(self._prompt))
+        print(f"🧠 Analyzing {len(stories)} stories in {len(batches)} batch(es)...")
+        return batches
     
-    def exec(self, prep_res):
-        if not prep_res:
-            return "No stories to analyze"
+    def analyze_batch(self, batch, splits_left=2):
+        """Analyze one batch; stories missing from the reply are retried in smaller batches"""
+        prompt = getattr(self, '_prompt', ANALYSIS_PROMPT).format(stories="\n".join(format_story_line(story) for story in batch))
+        response = call_llm(prompt, max_tokens=min(4000, 80 * len(batch) + 50), caller=type(self).__name__,
+                            cache_if=lambda reply: len(parse_analysis_lines(reply, batch)) == len(batch))
         
-        # Simplified prompt for better parsing
-        prompt = f"""Analyze these tech/AI news headlines. Provide ONLY:
-Theme (max 2 words)|Sentiment (positive/negative/neutral)|Brief insight (max 40 words)
-
-Headlines:
-{prep_res}
+        results = parse_analysis_lines(response, batch)
+        missing = [story for story in batch if str(story['id']) not in results]
+        if missing and splits_left > 0:
+            # Likely truncated output: re-ask for the missing stories in halves
+            half = max(1, len(missing) // 2)
+            for chunk in (missing[:half], missing[half:]):
+                if chunk:
+                    results.update(self.analyze_batch(chunk, splits_left - 1))
+        return results
+    
+    def analyze_locally(self, stories):
+        """Themes from the local engine; story sentiment from word lists, else the theme's
 
-Return format: Theme|Sentiment|Insight"""
+        Each story's insight is the opening of its own article, falling back
+        to the theme's insight when no excerpt was fetched.
+        """
+        engine = self._engine
+        assignments, new_ids = engine.assign(stories)
+        unlabeled = engine.unlabeled({cluster_id for cluster_id in assignments.values() if cluster_id is not None})
+        if unlabeled:
+            self.label_themes(unlabeled, stories, assignments)
         
-        return call_llm(prompt, max_tokens=150)
+        results = {}
+        for story in stories:
+            story_id = str(story['id'])
+            theme = engine.theme(assignments[story_id]) if assignments[story_id] is not None else None
+            excerpt = " ".join((story.get('text') or '').split()[:25])
+            results[story_id] = {
+                'theme': theme['label'] if theme else 'Mixed Topics',
+                'sentiment': story_sentiment(story) or (theme and theme['sentiment']) or 'neutral',
+                'insight': excerpt or (theme and theme['insight']) or 'No insight available'
+            }
+        if new_ids:
+            print(f"🆕 {len(new_ids)} new theme(s), {len(engine)} known")
+        return results
     
-    def exec_fallback(self, prep_res, exc):
-        print(f"❌ Analysis fallback triggered: {exc}")
-        return "Error|Neutral|Analysis failed due to API error"
+    def label_themes(self, cluster_ids, stories, assignments):
+        """Ask the LLM to name themes; on failure they keep their provisional names and are retried next time"""
+        samples = collections.defaultdict(list)
+        for story in stories:
+            cluster_id = assignments[str(story['id'])]
+            if cluster_id in cluster_ids and len(samples[cluster_id]) < 3:
+                samples[cluster_id].append(story['title'])
+        for start in range(0, len(cluster_ids), ANALYSIS_MAX_BATCH):
+            chunk = cluster_ids[start:start + ANALYSIS_MAX_BATCH]
+            prompt = getattr(self, '_label_prompt', THEME_LABEL_PROMPT).format(topics="\n".join(
+                json.dumps({'id': cluster_id, 'headlines': samples[cluster_id]}, ensure_ascii=False) for cluster_id in chunk))
+            topics = [{'id': cluster_id} for cluster_id in chunk]
+            try:
+                response = call_llm(prompt, max_tokens=min(4000, 80 * len(chunk) + 50), caller='ThemeLabels',
+                                    cache_if=lambda reply: len(parse_analysis_lines(reply, topics)) == len(topics))
+            except LLMError as e:
+                print(f"⚠️  Theme naming unavailable, keeping provisional names: {e}")
+                return
+            labels = parse_analysis_lines(response, topics)
+            self._engine.set_labels(labels)
+            print(f"🏷️  Named {len(labels)} theme(s)")
     
-    def post(self, shared, prep_res, exec_res):
-        try:
-            print(f"🧠 LLM Response: {exec_res}")
-            
-            # Clean and parse LLM response - take only first line if multiline
-            clean_response = exec_res.split('\n')[0].strip()
-            parts = clean_response.split('|')
-            
-            if len(parts) >= 3:
-                theme = parts[0].strip()
-                sentiment = parts[1].strip().lower()
-                insight = parts[2].strip()
-                
-                # Clean up theme (remove numbers, extra formatting)
-                theme = theme.replace('1.', '').replace('2.', '').replace('3.', '').strip()
-                
-                # Ensure sentiment is valid
-                if sentiment not in ['positive', 'negative', 'neutral']:
-                    sentiment = 'neutral'
-            else:
-                theme = "Mixed Topics"
-                sentiment = "neutral"
-                insight = clean_response[:40] if clean_response else "No insight available"
-                
-            analysis = {
-                'timestamp': shared.get('collection_time', datetime.datetime.now().isoformat()),
-                'theme': theme,
-                'sentiment': sentiment,
-                'insight': insight,
-                'story_count': len(shared.get('raw_stories', []))
-            }
-            
-            shared['analysis'] = analysis
-            print(f"✅ Analysis complete: {theme} ({sentiment}) - {insight}")
-            return "default"
-            
-        except Exception as e:
-            print(f"❌ Analysis post-processing error: {e}")
-            # Create fallback analysis
-            fallback_analysis = {
-                'timestamp': shared.get('collection_time', datetime.datetime.now().isoformat()),
-                'theme': 'Error',
-                'sentiment': 'neutral',
-                'insight': f'Analysis failed: {str(e)[:40]}',
-                'story_count': len(shared.get('raw_stories', []))
-            }
-            shared['analysis'] = fallback_analysis
-            return "default"
+    async def exec_async(self, batch):
+        async with self._slots:
+            if self._engine is not None:
+                return await asyncio.to_thread(self.analyze_locally, batch)
+            return await asyncio.to_thread(self.analyze_batch, batch)
+    
+    async def exec_fallback_async(self, batch, exc):
+        print(f"❌ Analysis fallback triggered for {len(batch)} stories: {exc}")
+        if isinstance(exc, LLMUnavailable):
+            self._unavailable.update(str(story['id']) for story in batch)
+        return {}
+    
+    async def post_async(self, shared, prep_res, exec_res):
+        stories = shared.get('raw_stories', [])
+        exec_res = {story_id: result for batch_results in (exec_res or []) for story_id, result in batch_results.items()}
+        timestamp = shared.get('collection_time', datetime.datetime.now().isoformat())
+        analysis = []
+        
+        failed = []
+        
+        for story in stories:
+            result = exec_res.get(str(story['id']))
+            if result is None:
+                failed.append(story)  # stays in the queue and is retried later
+                continue
+            analysis.append({
+                'timestamp': timestamp,
+                'story_id': story['id'],
+                'title': story['title'],
+                'theme': result['theme'],
+                'sentiment': result['sentiment'],
+                'insight': result['insight'],
+                'story_count': 1
+            })
+            print(f"✅ {story['title'][:40]}... → {result['theme']} ({result['sentiment']})")
+        
+        shared['analysis'] = analysis
+        shared['failed_stories'] = failed
+        shared['unavailable_story_ids'] = self._unavailable
+        print(f"✅ Analysis complete: {len(analysis)}/{len(stories)} stories analyzed")
+        return "default"
 
-class SaveDataNode(Node):
-    """Save analysis results to CSV"""
+class SaveDataNode(AsyncNode):
+    """Save analysis results to CSV, then acknowledge their queue jobs (file and DB work off the event loop)"""
+    
+    async def prep_async(self, shared):
+        analysis = shared.get('analysis', [])
+        print(f"💾 Preparing to save {len(analysis)} insight(s)")
+        return shared.setdefault('profile', Profile()), [record for record in analysis if isinstance(record, dict) and 'theme' in record]
     
-    def prep(self, shared):
-        analysis = shared.get('analysis', {})
-        print(f"💾 Preparing to save: {analysis}")
-        return analysis
+    async def exec_async(self, prep_res):
+        return await asyncio.to_thread(self.save, prep_res)
     
-    def exec(self, prep_res):
-        if prep_res and isinstance(prep_res, dict) and 'theme' in prep_res:
+    def save(self, prep_res):
+        profile, records = prep_res
+        if records:
             try:
-                save_to_csv(prep_res, 'agent_insights.csv')
-                return "Data saved successfully"
+                rollup = profile.rollup  # open (and backfill) before the CSV grows
+                if not save_to_csv(records, 'agent_insights.csv', profile.storage):
+                    return False, "Save error: insights not written"
+                profile.storage.flush()  # durable before the jobs are acknowledged
+                rollup.record(records)
+                return True, f"Saved {len(records)} insight(s) successfully"
             except Exception as e:
                 print(f"❌ Error saving to CSV: {e}")
-                return f"Save error: {e}"
-        return "No valid data to save"
+                return False, f"Save error: {e}"
+        return True, "No valid data to save"
     
-    def exec_fallback(self, prep_res, exc):
+    async def exec_fallback_async(self, prep_res, exc):
         print(f"❌ Save fallback triggered: {exc}")
-        return "Save failed - continuing anyway"
+        return False, "Save failed - continuing anyway"
     
-    def post(self, shared, prep_res, exec_res):
-        print(f"💾 {exec_res}")
+    async def post_async(self, shared, prep_res, exec_res):
+        saved, message = exec_res
+        print(f"💾 {message}")
         
-        # Clear processed data but keep seen_stories for next cycle
+        # Saved stories are done; unsaved or unanalyzed ones go back to the queue
+        profile, records = prep_res
+        jobs = shared.pop('leased_jobs', {})
+        done = [jobs[str(record['story_id'])] for record in records if saved and str(record['story_id']) in jobs]
+        # A story whose analysis failed only because the LLM was unavailable keeps its attempt
+        unavailable = shared.pop('unavailable_story_ids', set()) if saved else set()
+        release = [job_id for story_id, job_id in jobs.items() if story_id in unavailable]
+        retry = [job_id for job_id in jobs.values() if job_id not in set(done) | set(release)]
+        if done:
+            await asyncio.to_thread(profile.queue.ack, done)
+        if release:
+            await asyncio.to_thread(profile.queue.release, release, "LLM unavailable")
+            print(f"⏸️  {len(release)} stories returned to the queue until the LLM is available")
+        if retry:
+            await asyncio.to_thread(profile.queue.nack, retry, "analysis failed" if saved else message)
+            print(f"🔁 {len(retry)} stories returned to the queue for a later retry")
+        
+        # Clear processed data for the next batch
         shared.pop('raw_stories', None)
         shared.pop('analysis', None)
+        shared.pop('failed_stories', None)
+        shared.pop('unavailable_story_ids', None)
         
         return "default"
 
-class WaitNode(Node):
-    """Wait before next collection cycle"""
+class WaitNode(AsyncNode):
+    """Wait before next collection cycle, for as long as the scheduler decides"""
     
-    def prep(self, shared):
-        # Wait time: 15 minutes to be conservative with API usage
-        wait_minutes = 15
-        return wait_minutes
+    async def prep_async(self, shared):
+        scheduler = shared.setdefault('scheduler', shared.setdefault('profile', Profile()).scheduler())
+        started = shared.get('cycle_start', datetime.datetime.now())
+        interval = scheduler.record_cycle(started, shared.get('new_story_count', 0), shared.get('collection_failed', False))
+        return scheduler, interval
     
-    def exec(self, prep_res):
-        wait_seconds = prep_res * 60
-        print(f"Waiting {prep_res} minutes before next cycle...")
-        time.sleep(wait_seconds)
-        return f"Waited {prep_res} minutes"
+    async def exec_async(self, prep_res):
+        scheduler, interval = prep_res
+        if scheduler.stopping:
+            return "Skipped wait - shutting down"
+        next_poll = datetime.datetime.now() + datetime.timedelta(seconds=interval)
+        print(f"Waiting {interval / 60:.1f} minutes before next cycle (next poll {next_poll:%H:%M:%S}, "
+              f"new-story rate {scheduler.new_story_rate:.1f}/cycle, error rate {scheduler.error_rate:.2f})...")
+        started = time.monotonic()
+        woken = await scheduler.wait_async(interval)
+        self.deadline.extend(time.monotonic() - started)  # the budget covers work, not the wait
+        return "Woken early" if woken else f"Waited {interval / 60:.1f} minutes"
     
-    def post(self, shared, prep_res, exec_res):
-        print(f"[{datetime.datetime.now()}] Wait complete. Ready for report check.")
+    async def post_async(self, shared, prep_res, exec_res):
+        print(f"[{datetime.datetime.now()}] {exec_res}. Ready for report check.")
         return "default"
 
-class ReportNode(Node):
-    """Generate periodic summary report"""
+class ReportNode(AsyncNode):
+    """Generate periodic summary report (off the event loop: the LLM call may back off for a while)"""
     
-    def prep(self, shared):
-        # Check if it's time for a daily report
+    async def prep_async(self, shared):
+        # Check if it's time for a daily report (returns the profile to report on, or None)
         now = datetime.datetime.now()
-        last_report_file = 'last_report.txt'
+        profile = shared.setdefault('profile', Profile())
+        last_report_file = profile.path('last_report.txt')
         
         try:
             if Path(last_report_file).exists():
@@ -398,51 +3308,56 @@ class ReportNode(Node):
                 
                 # Generate report if more than 24 hours since last report
                 if (now - last_report_date).total_seconds() > 24 * 3600:
-                    return True
+                    return profile
             else:
-                return True  # First run
+                return profile  # First run
         except:
-            return True
+            return profile
         
-        return False
+        return None
     
-    def exec(self, prep_res):
+    async def exec_async(self, prep_res):
+        return await asyncio.to_thread(self.generate, prep_res)
+    
+    def generate(self, prep_res):
         if not prep_res:
             return "No report needed"
+        profile = prep_res
         
-        # Read recent insights from CSV
+        # Read today's aggregates and the recent ring from the rollup store
         try:
-            insights = []
-            if Path('agent_insights.csv').exists() and os.path.getsize('agent_insights.csv') > 0:
-                with open('agent_insights.csv', 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    insights = list(reader)[-10:]  # Last 10 entries
+            rollup = profile.rollup
+            theme_counts = rollup.counts('theme', days=1)
+            sentiment_counts = rollup.counts('sentiment', days=1)
+            weekly_themes = rollup.top_themes(days=7)
+            insights = rollup.recent(10)
             
             if insights:
                 # Generate summary report
-                themes = [i.get('theme', 'Unknown') for i in insights if 'theme' in i]
-                sentiments = [i.get('sentiment', 'neutral') for i in insights if 'sentiment' in i]
-                
-                if themes and sentiments:
-                    prompt = f"""Create a brief daily summary based on these tech trends:
-Themes: {', '.join(themes)}
-Sentiments: {', '.join(sentiments)}
-
-Provide: 1 key trend, overall sentiment, 1 prediction (max 80 words total)"""
-                    
-                    summary = call_llm(prompt, max_tokens=150)
+                if theme_counts and sentiment_counts:
+                    engine = profile.theme_engine
+                    if engine is not None and profile.report_prompt == REPORT_PROMPT:
+                        summary = summarize_themes(rollup, engine)  # built locally, no LLM call
+                    else:
+                        prompt = profile.report_prompt.format(
+                            themes=', '.join(f'{theme} ({count})' for theme, count in list(theme_counts.items())[:10]),
+                            sentiments=', '.join(f'{sentiment} ({count})' for sentiment, count in sentiment_counts.items()),
+                            weekly=', '.join(f'{theme} ({count})' for theme, count in weekly_themes),
+                            insights=' | '.join(i['insight'] for i in insights[:5]))
+                        
+                        summary = call_llm(prompt, max_tokens=150, caller=type(self).__name__)
                     
                     # Save report
                     report_data = {
                         'date': datetime.datetime.now().date().isoformat(),
-                        'insights_analyzed': len(insights),
+                        'insights_analyzed': sum(theme_counts.values()),
                         'summary': summary[:200]  # Limit summary length
                     }
                     
-                    save_to_csv(report_data, 'daily_reports.csv')
+                    save_to_csv(report_data, 'daily_reports.csv', profile.storage)
                     
                     # Update last report time
-                    with open('last_report.txt', 'w') as f:
+                    with open(profile.path('last_report.txt'), 'w') as f:
                         f.write(datetime.datetime.now().isoformat())
                     
                     return f"Daily report generated: {summary[:100]}..."
@@ -454,7 +3369,7 @@ Provide: 1 key trend, overall sentiment, 1 prediction (max 80 words total)"""
         except Exception as e:
             return f"Report error: {e}"
     
-    def post(self, shared, prep_res, exec_res):
+    async def post_async(self, shared, prep_res, exec_res):
         if "generated" in exec_res:
             print(f"📊 {exec_res}")
         else:
@@ -463,78 +3378,345 @@ Provide: 1 key trend, overall sentiment, 1 prediction (max 80 words total)"""
         print(f"🔄 Cycle complete - flow will restart")
         return None
 
-def create_autonomous_agent():
-    """Create the autonomous monitoring agent flow"""
+def create_autonomous_agent(wait=True):
+    """Create the autonomous monitoring agent flow (collection side; analysis runs in workers)"""
     
     # Create nodes
     collect_node = DataCollectionNode(max_retries=2, wait=5)
-    analyze_node = AnalysisNode(max_retries=2, wait=3)
-    save_node = SaveDataNode()
-    wait_node = WaitNode()
     report_node = ReportNode()
     
-    # Create a simple linear flow that loops back to start
-    collect_node - "analyze" >> analyze_node
-    collect_node - "wait" >> wait_node  # Skip analysis if no stories
-    
-    analyze_node >> save_node  # Always save after analysis
-    save_node >> wait_node     # Always wait after saving
-    wait_node >> report_node   # Check for daily report
+    # New stories go to the work queue, so collection never waits on the LLM
+    if wait:
+        wait_node = WaitNode()
+        collect_node - "wait" >> wait_node
+        wait_node >> report_node   # Check for daily report
+    else:
+        collect_node - "wait" >> report_node  # one-shot runs leave the waiting to cron
     
     # report_node ends the flow, causing main loop to restart
     
-    return Flow(start=collect_node)
+    flow = AsyncFlow(start=collect_node)
+    flow.observer = record_node_metrics
+    flow.budget = CYCLE_BUDGET_SECONDS or None  # bounds every HTTP/LLM timeout and retry in the cycle
+    return flow
+
+def create_analysis_worker():
+    """Create the flow an analysis worker runs per leased batch"""
+    enrich_node = EnrichmentNode()
+    analyze_node = AnalysisNode()  # transient LLM failures are retried with backoff by the gateway
+    save_node = SaveDataNode()
+    
+    enrich_node >> analyze_node  # Article excerpts are optional context for the analysis
+    analyze_node >> save_node    # Always save (and ack) after analysis
+    
+    flow = AsyncFlow(start=enrich_node)
+    flow.observer = record_node_metrics
+    flow.budget = CYCLE_BUDGET_SECONDS or None  # per leased batch; unfinished stories go back to the queue
+    return flow
+
+async def drain_analysis_queue(profile, worker=None, stop=None, max_seconds=None):
+    """Lease and analyze batches until the profile's queue has nothing available; returns batches run
+
+    With `max_seconds`, no new batch is leased after that long; the rest
+    stays queued for the next run.
+    """
+    worker = worker or create_analysis_worker()
+    batches = 0
+    give_up_at = time.monotonic() + max_seconds if max_seconds else None
+    while not (stop and stop()):
+        if give_up_at is not None and time.monotonic() >= give_up_at:
+            print(f"⏱️  Drain time limit reached after {batches} batch(es); the rest waits for the next run")
+            break
+        leased = await asyncio.to_thread(profile.queue.lease, ANALYSIS_MAX_BATCH * ANALYSIS_CONCURRENCY)
+        if not leased:
+            break
+        print(f"📤 Leased {len(leased)} stories for analysis")
+        await worker.run_async({
+            'profile': profile,
+            'leased_jobs': {str(story['id']): job_id for job_id, story in leased},
+            'raw_stories': [story for _, story in leased],
+            'collection_time': datetime.datetime.now().isoformat(),
+        })
+        batches += 1
+    return batches
+
+async def run_analysis_worker(profile, scheduler, worker_id=0):
+    """Drain the work queue whenever stories arrive, until the scheduler is stopped"""
+    worker = create_analysis_worker()
+    stopping = lambda: scheduler.stopping
+    while not stopping():
+        try:
+            await drain_analysis_queue(profile, worker, stopping)
+        except Exception as e:
+            print(f"⚠️  Analysis worker {worker_id} error: {type(e).__name__}: {e}")
+            get_metrics().inc('worker_errors_total', profile=profile.name)
+        if not stopping():
+            await profile.queue.wait_async(QUEUE_POLL_SECONDS)
+
+async def run_profile_once(profile, scheduler):
+    """One collection cycle, report check and queue drain for a profile; True on success"""
+    shared = {'profile': profile, 'scheduler': scheduler, 'cycles_completed': 0,
+              'cycle_start': datetime.datetime.now()}
+    failed = False
+    try:
+        await create_autonomous_agent(wait=False).run_async(shared)
+        failed = shared.get('collection_failed', False)
+        await drain_analysis_queue(profile, max_seconds=ONCE_DRAIN_SECONDS)
+    except Exception as e:
+        print(f"⚠️  Cycle error ({profile.name}): {type(e).__name__}: {e}")
+        failed = True
+    interval = scheduler.record_cycle(shared['cycle_start'], shared.get('new_story_count', 0), failed)
+    profile.storage.flush()
+    save_agent_state(profile, scheduler)
+    print(f"🕒 {profile.name}: next run due in {interval / 60:.1f} minutes; queue {profile.queue.stats()}")
+    return not failed
+
+def acquire_agent_lock(path=None):
+    """Take the exclusive AGENT_LOCK_FILE lock for the rest of the process; False if another agent holds it
+
+    Opening a WorkQueue hands leases left by a previous owner back out, so
+    two processes on the same state (a slow --once run and the next cron
+    run, or --once next to the long-running agent) must never overlap.
+    """
+    global _agent_lock
+    if _agent_lock is not None:
+        return True
+    handle = open(path or AGENT_LOCK_FILE, 'a+')
+    try:
+        import fcntl
+    except ImportError:  # no advisory locks on this platform
+        _agent_lock = handle
+        return True
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    handle.seek(0)
+    handle.truncate()
+    handle.write(f"{os.getpid()}\n")
+    handle.flush()
+    _agent_lock = handle
+    return True
+
+def run_once(force=False, config_path=None):
+    """Run one pass for every due profile and return a process exit code
+
+    Entry point for cron, short-lived containers and embedding. Profiles
+    whose adaptive interval has not elapsed since their last run are
+    skipped without any network or LLM work (unless `force`). Returns 0 on
+    success, when nothing was due or another run still holds the agent
+    lock, 1 if a cycle failed, 2 on bad config.
+    """
+    started = time.perf_counter()
+    try:
+        load_config_overrides(config_path)
+        profiles = load_profiles(config_path)
+    except Exception as e:
+        print(f"❌ Invalid configuration: {e}")
+        return 2
+    if not os.getenv("OPENAI_API_KEY"):
+        print("❌ Error: OPENAI_API_KEY environment variable not set")
+        return 2
+    if not acquire_agent_lock():
+        print(f"⏭️  Another agent run holds {AGENT_LOCK_FILE}, skipping this one")
+        return 0
+    
+    now = time.time()
+    due = []
+    for profile in profiles:
+        scheduler = profile.scheduler()
+        if force or scheduler.next_due <= now:
+            due.append((profile, scheduler))
+        else:
+            print(f"⏭️  {profile.name}: not due for another {(scheduler.next_due - now) / 60:.1f} minutes")
+    
+    async def run_due():
+        return await asyncio.gather(*(run_profile_once(profile, scheduler) for profile, scheduler in due))
+    
+    results = asyncio.run(run_due()) if due else []
+    exit_code = 0 if all(results) else 1
+    
+    # Cold start: interpreter to the first line of run_once (imports and module setup)
+    cold_start = started - _IMPORT_STARTED
+    run_seconds = time.perf_counter() - started
+    metrics = get_metrics()
+    metrics.observe('cold_start_seconds', cold_start)
+    metrics.observe('once_run_seconds', run_seconds)
+    metrics.event('once', cold_start_s=round(cold_start, 4), run_s=round(run_seconds, 4),
+                  profiles_due=len(due), profiles=len(profiles), exit_code=exit_code)
+    print(f"⏱️  Cold start {cold_start * 1000:.0f} ms, run {run_seconds * 1000:.0f} ms, "
+          f"{len(due)}/{len(profiles)} profile(s) due, exit code {exit_code}")
+    return exit_code
 
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description="Autonomous tech/AI news monitoring agent")
+    parser.add_argument('--migrate-storage', action='store_true',
+                        help="import the CSV files into the SQLite storage backend and exit")
+    parser.add_argument('--requeue-failed', action='store_true',
+                        help="give stories parked as failed in the analysis queue a fresh set of attempts and exit")
+    parser.add_argument('--once', action='store_true',
+                        help="run one cycle for every due profile and exit with a status code (for cron)")
+    parser.add_argument('--force', action='store_true',
+                        help="with --once, run even if the adaptive schedule says it is not due yet")
+    args = parser.parse_args()
+    
+    if args.once:
+        return run_once(force=args.force)
+    
+    if args.migrate_storage:
+        migrated = migrate_csv_to_sqlite()
+        print(f"✅ Migration complete: {migrated or 'nothing to migrate'}. Set STORAGE_BACKEND=sqlite to use it.")
+        return
+    
+    if args.requeue_failed:
+        if not acquire_agent_lock():
+            print(f"❌ The agent is running (it holds {AGENT_LOCK_FILE}); stop it before re-queuing")
+            return 1
+        for profile in load_profiles():
+            prefix = f"[{profile.name}] " if not profile.is_default else ""
+            print(f"♻️  {prefix}Re-queued {profile.queue.requeue_failed()} failed stories")
+        return
+    
     print("🤖 Starting Autonomous Monitoring Agent (FIXED VERSION)")
     print("📊 Monitoring tech/AI news and generating insights")
-    print("💾 Data saved to: agent_insights.csv, daily_reports.csv, seen_stories.csv")
+    
+    applied = load_config_overrides()
+    if applied:
+        print(f"⚙️  Config overrides from {AGENT_CONFIG_FILE}: {applied}")
+    profiles = load_profiles()
+    
+    for profile in profiles:
+        prefix = f"[{profile.name}] " if not profile.is_default else ""
+        print(f"💾 {prefix}Data saved to: {profile.path('agent_insights.csv')}, {profile.path('daily_reports.csv')}; "
+              f"seen stories indexed in {profile.db_path}")
     print("🔄 Duplicate detection: FIXED (saves tokens)")
-    print("⏰ Collection cycle: 15 minutes")
-    print("🛑 Press Ctrl+C to stop\n")
+    print(f"⏰ Collection cycle: adaptive, {POLL_MIN_SECONDS / 60:g}-{POLL_MAX_SECONDS / 60:g} minutes")
+    print("🛑 Press Ctrl+C (or send SIGTERM) to stop, SIGHUP to reload config and poll now\n")
     
     # Verify API key
     if not os.getenv("OPENAI_API_KEY"):
         print("❌ Error: OPENAI_API_KEY environment variable not set")
-        return
+        return 2
+    if not acquire_agent_lock():
+        print(f"❌ Another agent is already running here (it holds {AGENT_LOCK_FILE})")
+        return 1
     
-    # Create shared data store
-    shared = {
-        'agent_start_time': datetime.datetime.now().isoformat(),
-        'cycles_completed': 0
-    }
+    # One shared data store and flow per profile, all on one event loop
+    started = datetime.datetime.now()
+    runs = []
+    for profile in profiles:
+        shared = {
+            'agent_start_time': started.isoformat(),
+            'cycles_completed': 0,
+            'profile': profile,
+            'scheduler': profile.scheduler()
+        }
+        runs.append((create_autonomous_agent(), shared))
+    install_signal_handlers(*(shared['scheduler'] for _, shared in runs))
+    if METRICS_PORT:
+        get_metrics().serve(METRICS_PORT)
+        print(f"📈 Metrics at http://127.0.0.1:{METRICS_PORT}/metrics")
     
-    # Create the agent
-    agent = create_autonomous_agent()
+    def cycles_completed():
+        return ', '.join(f"{shared['cycles_completed']} ({shared['profile'].name})" if len(runs) > 1
+                         else str(shared['cycles_completed']) for _, shared in runs)
     
     try:
-        while True:
-            cycle_start = datetime.datetime.now()
-            print(f"\n🔄 Cycle {shared['cycles_completed'] + 1} - {cycle_start}")
-            
-            try:
-                # Run one complete cycle
-                result = agent.run(shared)
-                print(f"🔗 Flow result: {result}")
-                
-                shared['cycles_completed'] += 1
-                cycle_duration = datetime.datetime.now() - cycle_start
-                print(f"✅ Cycle completed in {cycle_duration.total_seconds():.1f} seconds")
-                
-            except Exception as e:
-                print(f"⚠️  Cycle error: {e}")
-                print(f"🔍 Error details: {type(e).__name__}: {str(e)}")
-                print("🔄 Continuing to next cycle...")
-                time.sleep(60)  # Wait 1 minute before retry
-                continue
-            
+        asyncio.run(run_profiles(runs))
+        print(f"\n🛑 Agent stopped after {cycles_completed()} cycles")
+        print(f"📈 Total runtime: {datetime.datetime.now() - started}")
     except KeyboardInterrupt:
-        print(f"\n🛑 Agent stopped by user after {shared['cycles_completed']} cycles")
-        print(f"📈 Total runtime: {datetime.datetime.now() - datetime.datetime.fromisoformat(shared['agent_start_time'])}")
+        print(f"\n🛑 Agent stopped by user after {cycles_completed()} cycles")
+        print(f"📈 Total runtime: {datetime.datetime.now() - started}")
     except Exception as e:
         print(f"\n❌ Agent error: {e}")
         print("🔄 Agent will restart automatically if run again")
+        return 1
+
+def install_signal_handlers(*schedulers):
+    """SIGTERM/SIGINT stop the agent after the current step; SIGHUP reloads config and polls now"""
+    def handle_stop(signum, frame):
+        if all(scheduler.stopping for scheduler in schedulers):
+            raise KeyboardInterrupt  # second Ctrl+C: stop immediately
+        print(f"\n🛑 Received {signal.Signals(signum).name}, stopping after current step...")
+        for scheduler in schedulers:
+            scheduler.stop()
+    
+    def handle_reload(signum, frame):
+        for scheduler in schedulers:
+            scheduler.wake(reload=True)
+    
+    signal.signal(signal.SIGINT, handle_stop)
+    signal.signal(signal.SIGTERM, handle_stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, handle_reload)
+
+async def run_profiles(runs):
+    """Run every (agent, shared) profile pair concurrently on the current event loop"""
+    await asyncio.gather(*(run_agent(agent, shared) for agent, shared in runs))
+
+async def run_agent(agent, shared):
+    """Run collection cycles plus the profile's analysis workers until the scheduler is stopped"""
+    profile = shared.setdefault('profile', Profile())
+    scheduler = shared.setdefault('scheduler', profile.scheduler())
+    workers = [asyncio.create_task(run_analysis_worker(profile, scheduler, i)) for i in range(max(1, ANALYSIS_WORKERS))]
+    try:
+        await run_collection(agent, shared, profile, scheduler)
+    finally:
+        scheduler.stop()        # workers only exit once the scheduler is stopping
+        profile.queue.notify()  # wake idle workers so they see the stop
+        await asyncio.gather(*workers, return_exceptions=True)
+
+async def run_collection(agent, shared, profile, scheduler):
+    """Run collection cycles until the scheduler is stopped"""
+    while not scheduler.stopping:
+        cycle_start = datetime.datetime.now()
+        shared['cycle_start'] = cycle_start
+        label = "" if profile.is_default else f" [{profile.name}]"
+        print(f"\n🔄 Cycle {shared['cycles_completed'] + 1}{label} - {cycle_start}")
+        
+        try:
+            if scheduler.reload_requested:
+                scheduler.reload_requested = False
+                try:
+                    print(f"⚙️  Reloaded config: {load_config_overrides() or 'no overrides'}")
+                except Exception as e:
+                    print(f"⚠️  Config reload failed, keeping previous settings: {type(e).__name__}: {e}")
+                    get_metrics().inc('config_reload_errors_total')
+            
+            # Run one complete cycle
+            result = await agent.run_async(shared)
+            print(f"🔗 Flow result: {result}")
+            
+            shared['cycles_completed'] += 1
+            cycle_duration = datetime.datetime.now() - cycle_start
+            print(f"✅ Cycle completed in {cycle_duration.total_seconds():.1f} seconds")
+            profile.storage.flush()
+            save_agent_state(profile, scheduler)
+            metrics = get_metrics()
+            metrics.observe('cycle_seconds', cycle_duration.total_seconds())
+            metrics.inc('cycles_total', profile=profile.name)
+            queue_stats = profile.queue.stats()
+            print(f"📬 Analysis queue: {queue_stats}")
+            metrics.event('cycle', profile=profile.name, cycle=shared['cycles_completed'],
+                          seconds=round(cycle_duration.total_seconds(), 3), queue=queue_stats,
+                          new_stories=shared.get('new_story_count', 0), **metrics.snapshot())
+            if scheduler.history:
+                print(f"🕒 Last cycle: {scheduler.history[-1]}")
+            if _llm_cache is not None:
+                print(f"🗃️  LLM cache: {_llm_cache.stats()}")
+            if _llm_gateway is not None:
+                print(f"💸 LLM gateway: {_llm_gateway.stats()}")
+            
+        except Exception as e:
+            print(f"⚠️  Cycle error: {e}")
+            print(f"🔍 Error details: {type(e).__name__}: {str(e)}")
+            interval = scheduler.record_cycle(cycle_start, error=True)
+            get_metrics().inc('cycle_errors_total', profile=profile.name)
+            print(f"🔄 Continuing to next cycle in {interval:.0f} seconds...")
+            await scheduler.wait_async(interval)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file